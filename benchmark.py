@@ -0,0 +1,129 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Benchmark harness, shared by the scripts of this repository.
+#
+# run( name, function, *args ) calls function(*args) loops times per run,
+# after some warmup runs, and repeats this repeat times. The time of an empty
+# loop of the same length is subtracted, so the result is the time per call
+# of the function, including the call overhead.
+# The result is printed as one JSON line and returned as a dict:
+#    {"name": ..., "min_us": ..., "median_us": ..., "stddev_us": ...,
+#     "loops": ..., "items": ..., "repeat": ..., "platform": ...}
+# All times are in microseconds per call. Use min_us to compare, the
+# minimum is the run with least interference (interrupts, garbage collection).
+#
+# From the signal_processing folder, import with:
+#    import sys
+#    sys.path.append("..")
+#    import benchmark
+import sys
+import time
+import gc
+import json
+
+WARMUP = 1
+REPEAT = 5
+
+# Time of loops calls of function(*args) in microseconds.
+# The calls with up to 5 arguments are written out, so that the
+# overhead of function(*args) is not measured.
+def _time_calls( function, args, loops ):
+    r = range(loops)
+    n = len(args)
+    if n == 0:
+        t0 = time.ticks_us()
+        for _ in r:
+            function()
+    elif n == 1:
+        a, = args
+        t0 = time.ticks_us()
+        for _ in r:
+            function(a)
+    elif n == 2:
+        a, b = args
+        t0 = time.ticks_us()
+        for _ in r:
+            function(a, b)
+    elif n == 3:
+        a, b, c = args
+        t0 = time.ticks_us()
+        for _ in r:
+            function(a, b, c)
+    elif n == 4:
+        a, b, c, d = args
+        t0 = time.ticks_us()
+        for _ in r:
+            function(a, b, c, d)
+    elif n == 5:
+        a, b, c, d, e = args
+        t0 = time.ticks_us()
+        for _ in r:
+            function(a, b, c, d, e)
+    else:
+        t0 = time.ticks_us()
+        for _ in r:
+            function(*args)
+    return time.ticks_diff( time.ticks_us(), t0 )
+
+# Time of an empty loop, same loop as _time_calls
+def _time_loop( loops ):
+    r = range(loops)
+    t0 = time.ticks_us()
+    for _ in r:
+        pass
+    return time.ticks_diff( time.ticks_us(), t0 )
+
+# Shortest empty loop time for each number of loops
+_baselines = {}
+
+def baseline( loops, repeat=REPEAT ):
+    t = _baselines.get( loops )
+    if t is None:
+        t = min( _time_loop( loops ) for _ in range(repeat) )
+        _baselines[loops] = t
+    return t
+
+def median( values ):
+    s = sorted( values )
+    n = len(s)
+    if n % 2:
+        return s[n//2]
+    return (s[n//2-1] + s[n//2])/2
+
+def stddev( values ):
+    n = len(values)
+    mean = sum(values)/n
+    return (sum( (v-mean)**2 for v in values )/n)**0.5
+
+# Measure function(*args), see above. Returns the result dict.
+# loops: calls per run, use more than 1 for functions that take a few
+# microseconds, so that the resolution of ticks_us does not matter.
+# items: number of operations done by each call of function, for example
+# the items of a generator, the times are then per operation.
+def run( name, function, *args, loops=1, repeat=REPEAT, warmup=WARMUP, items=1 ):
+    for _ in range(warmup):
+        _time_calls( function, args, loops )
+    empty = baseline( loops, repeat )
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        times.append( (_time_calls( function, args, loops ) - empty)/(loops*items) )
+    result = {
+        "name": name,
+        "min_us": round( min(times), 3 ),
+        "median_us": round( median(times), 3 ),
+        "stddev_us": round( stddev(times), 3 ),
+        "loops": loops,
+        "items": items,
+        "repeat": repeat,
+        "platform": sys.platform,
+    }
+    print( json.dumps( result ) )
+    return result
+
+# Ratio of the min_us of two results, e.g. ratio( plain, viper )
+def ratio( result1, result2 ):
+    if result2["min_us"] <= 0:
+        return 0
+    return result1["min_us"]/result2["min_us"]
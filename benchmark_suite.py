@@ -0,0 +1,146 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Benchmark suite for the kernels of this repository, for sizes 64 to 4096,
+# with regression check against a baseline file.
+#
+# Run from this folder, on the unix port or on the board:
+#    micropython benchmark_suite.py            compare with the baseline
+#    micropython benchmark_suite.py --update   store a new baseline
+#    micropython benchmark_suite.py --threshold 0.1
+#
+# The baseline is stored in benchmark_baseline_<sys.platform>.json, one file
+# per platform, with the min_us of each benchmark. Create it with --update
+# on the platform to check, without a baseline the script exits with
+# status 2, so that an unattended run never passes without a comparison.
+# A benchmark regresses when its min_us is more than threshold (default 20%)
+# above the baseline. The script then exits with status 1, so it can
+# run unattended, for example in a CI job with the unix port.
+import sys
+import array
+import json
+sys.path.append("signal_processing")
+import benchmark
+import fft_int
+import autocorrelation
+import call_overhead
+
+SIZES = (64, 256, 1024, 4096)
+THRESHOLD = 0.2
+CALL_LOOPS = 10000
+
+# Same as example.py, that file can't be imported since it ends with
+# an example of a viper compile error
+@micropython.viper
+def viper_add_to_array( pa:ptr32, n:int, length:int)->int:
+    sum_array = 0
+    i = 0
+    while i < length:
+        pa[i] += n
+        sum_array += pa[i]
+        i += 1
+    return sum_array
+
+# Recursive FFT, as fft() did before the plans, see fft_benchmark.py
+def recursive_fft( data, buf_real, buf_imag, out_real, out_imag, n ):
+    fft_int.array_copy( data, buf_real, n )
+    fft_int.array_copy( buf_real, out_real, n )
+    fft_int.array_zero( buf_imag, n )
+    fft_int.array_zero( out_imag, n )
+    fft_int._fftint( buf_real, buf_imag, out_real, out_imag, n, 1, fft_int.get_cos_table() )
+
+def zeros( n ):
+    return array.array("i", (0 for _ in range(n)))
+
+# Run all benchmarks, returns a dict of name: min_us
+def run_all():
+    results = {}
+    def run( name, function, *args, loops=1 ):
+        results[name] = benchmark.run( name, function, *args, loops=loops )["min_us"]
+
+    for n in SIZES:
+        # More loops for small sizes, so that each run takes some time
+        loops = max( 1, 1024//n )
+        # 12 bit signal up to n=1024. autocorrelation()[0] is about
+        # n*amplitude**2/3, so the amplitude is halved for each factor
+        # of 4 above 1024 to keep it in 31 bits, no overflow in the FFT
+        # or autocorrelation
+        amplitude = 2048
+        m = n
+        while m > 1024:
+            amplitude //= 2
+            m //= 4
+        data = array.array("i", ((i*37)%(2*amplitude)-amplitude for i in range(n)))
+        buf_real = zeros( n )
+        buf_imag = zeros( n )
+        out_real = zeros( n )
+        out_imag = zeros( n )
+        if n <= fft_int.BUFFER_SIZE:
+            # _fftint uses get_cos_table(), of size BUFFER_SIZE
+            run( f"_fftint n={n}", recursive_fft, data, buf_real, buf_imag, out_real, out_imag, n, loops=loops )
+        fft_int.get_plan( n )
+        run( f"fft n={n}", fft_int.fft, data, loops=loops )
+        run( f"rfft n={n}", fft_int.rfft, data, loops=loops )
+        if n <= 1024:
+            # O(n**2), 4096 would take too long on a microcontroller
+            run( f"autocorrelation n={n}", autocorrelation.autocorrelation, data, n, out_real )
+        run( f"autocorrelation_fft n={n}", autocorrelation.autocorrelation_fft, data, n, out_real )
+        run( f"viper_add_to_array n={n}", viper_add_to_array, buf_real, 1, n, loops=loops )
+        run( f"array_copy n={n}", fft_int.array_copy, data, buf_real, n, loops=loops )
+
+    for name, result in call_overhead.run_all( CALL_LOOPS ).items():
+        results[name] = result["min_us"]
+    return results
+
+def baseline_filename():
+    return f"benchmark_baseline_{sys.platform}.json"
+
+def load_baseline():
+    try:
+        with open( baseline_filename() ) as file:
+            return json.load( file )
+    except OSError:
+        return None
+
+def save_baseline( results ):
+    with open( baseline_filename(), "w" ) as file:
+        json.dump( results, file )
+    print(f"Baseline stored in {baseline_filename()}")
+
+# Returns the list of benchmarks that are slower than the baseline
+# by more than threshold, and prints a JSON line for each benchmark
+def compare( results, baseline, threshold ):
+    regressions = []
+    for name, min_us in results.items():
+        base = baseline.get( name )
+        if base is None or base <= 0:
+            continue
+        change = (min_us - base)/base
+        regressed = change > threshold
+        print( json.dumps( { "name": name, "min_us": min_us, "baseline_us": base,
+                             "change": round( change, 3 ), "regression": regressed } ) )
+        if regressed:
+            regressions.append( name )
+    return regressions
+
+def main( argv ):
+    update = "--update" in argv
+    threshold = THRESHOLD
+    if "--threshold" in argv:
+        threshold = float( argv[argv.index("--threshold")+1] )
+    results = run_all()
+    if update:
+        save_baseline( results )
+        return 0
+    baseline = load_baseline()
+    if baseline is None:
+        print(f"No baseline {baseline_filename()}, run with --update to create it")
+        return 2
+    regressions = compare( results, baseline, threshold )
+    if regressions:
+        print(f"{len(regressions)} regressions over {threshold*100:.0f}%: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions over {threshold*100:.0f}%")
+    return 0
+
+sys.exit( main( sys.argv ) )
@@ -0,0 +1,240 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Function call overhead, to decide where to put the boundaries
+# of viper kernels. Extends the call_funs() test of viper_native.py:
+# * 0 to 4 arguments, undecorated, native and viper, with and without int hints
+# * each viper argument type: object, int, uint, ptr8, ptr16, ptr32
+# * return types: none, int (small and boxed), uint, object, ptr32
+# * bound methods, as in classes.py
+# * viper to viper calls, as function_a and function_b of testviper.py
+# * viper called in a generator and in asyncio coroutines
+# All times are microseconds per call, see benchmark.py.
+# Run with: micropython call_overhead.py
+import sys
+import array
+import asyncio
+import benchmark
+
+LOOPS = 10000
+# Items per call for the generator, asyncio and viper to viper tests
+ITEMS = 1000
+
+def undecorated0():
+    return
+def undecorated1(a):
+    return
+def undecorated2(a,b):
+    return
+def undecorated3(a,b,c):
+    return
+def undecorated4(a,b,c,d):
+    return
+
+@micropython.native
+def native0():
+    return
+@micropython.native
+def native1(a):
+    return
+@micropython.native
+def native2(a,b):
+    return
+@micropython.native
+def native3(a,b,c):
+    return
+@micropython.native
+def native4(a,b,c,d):
+    return
+
+@micropython.viper
+def viper0():
+    return
+@micropython.viper
+def viper1(a):
+    return
+@micropython.viper
+def viper2(a,b):
+    return
+@micropython.viper
+def viper3(a,b,c):
+    return
+@micropython.viper
+def viper4(a,b,c,d):
+    return
+
+@micropython.viper
+def viper_int1(a:int):
+    return
+@micropython.viper
+def viper_int2(a:int,b:int):
+    return
+@micropython.viper
+def viper_int3(a:int,b:int,c:int):
+    return
+@micropython.viper
+def viper_int4(a:int,b:int,c:int,d:int):
+    return
+
+# One argument of each viper type
+@micropython.viper
+def arg_object(a:object):
+    return
+@micropython.viper
+def arg_uint(a:uint):
+    return
+@micropython.viper
+def arg_ptr8(a:ptr8):
+    return
+@micropython.viper
+def arg_ptr16(a:ptr16):
+    return
+@micropython.viper
+def arg_ptr32(a:ptr32):
+    return
+
+# Return types
+# No return annotation, returns the object None
+@micropython.viper
+def return_none(a:int):
+    return None
+@micropython.viper
+def return_int(a:int)->int:
+    return a
+@micropython.viper
+def return_uint(a:uint)->uint:
+    return a
+@micropython.viper
+def return_object(a)->object:
+    return a
+@micropython.viper
+def return_ptr32(a:ptr32)->ptr32:
+    return a
+
+# Methods, see classes.py
+class PlainClass:
+    def method(self, a):
+        return
+class ViperMethodClass:
+    @micropython.viper
+    def method(self, a:int):
+        return
+@micropython.viper
+class ViperClass:
+    def method(self, a):
+        return
+
+# Viper to viper calls, see function_a and function_b in testviper.py
+@micropython.viper
+def function_b(x:int)->int:
+    return x+1
+
+@micropython.viper
+def viper_calls_viper(n:int)->int:
+    x:int = 0
+    i:int = 0
+    while i < n:
+        x = int(function_b(x))
+        i += 1
+    return x
+
+# Same loop with the function inlined
+@micropython.viper
+def viper_inline(n:int)->int:
+    x:int = 0
+    i:int = 0
+    while i < n:
+        x = x+1
+        i += 1
+    return x
+
+# Python loop calling viper, to compare with the generator and asyncio
+def python_calls_viper(n):
+    x = 0
+    for _ in range(n):
+        x = function_b(x)
+    return x
+
+def generator(n):
+    x = 0
+    for _ in range(n):
+        x = function_b(x)
+        yield x
+
+def consume_generator(n):
+    for _ in generator(n):
+        pass
+
+async def coroutine_calls_viper(n):
+    x = 0
+    for _ in range(n):
+        x = function_b(x)
+    return x
+
+async def async_function_b(x):
+    return function_b(x)
+
+async def coroutine_awaits(n):
+    x = 0
+    for _ in range(n):
+        x = await async_function_b(x)
+    return x
+
+async def coroutine_sleeps(n):
+    x = 0
+    for _ in range(n):
+        x = function_b(x)
+        await asyncio.sleep_ms(0)
+    return x
+
+def run_coroutine( coroutine, n ):
+    asyncio.run( coroutine(n) )
+
+# Run all tests, returns a dict of name: result
+def run_all( loops=LOOPS, items=ITEMS ):
+    results = {}
+    def run( name, function, *args, count=1 ):
+        if count == 1:
+            results[name] = benchmark.run( name, function, *args, loops=loops )
+        else:
+            results[name] = benchmark.run( name, function, *args, items=count )
+
+    for name, functions in ( ("undecorated", (undecorated0, undecorated1, undecorated2, undecorated3, undecorated4)),
+                             ("native", (native0, native1, native2, native3, native4)),
+                             ("viper", (viper0, viper1, viper2, viper3, viper4)),
+                             ("viper int", (viper0, viper_int1, viper_int2, viper_int3, viper_int4)) ):
+        for n, function in enumerate(functions):
+            run( f"call {name} {n} args", function, *range(1, n+1) )
+
+    data = array.array("i", (0 for _ in range(16)))
+    run( "call viper arg object", arg_object, 1 )
+    run( "call viper arg int", viper_int1, 1 )
+    run( "call viper arg uint", arg_uint, 1 )
+    run( "call viper arg ptr8", arg_ptr8, data )
+    run( "call viper arg ptr16", arg_ptr16, data )
+    run( "call viper arg ptr32", arg_ptr32, data )
+
+    run( "call viper return none", return_none, 1 )
+    run( "call viper return int", return_int, 1 )
+    # sys.maxsize is the largest viper int, on 32 and 64 bit ports it
+    # does not fit in a small int, the result allocates a long int
+    run( "call viper return int boxed", return_int, sys.maxsize )
+    run( "call viper return uint", return_uint, 1 )
+    run( "call viper return object", return_object, 1 )
+    run( "call viper return ptr32", return_ptr32, data )
+
+    run( "call bound method", PlainClass().method, 1 )
+    run( "call viper bound method", ViperMethodClass().method, 1 )
+    run( "call viper class bound method", ViperClass().method, 1 )
+
+    run( "call viper from viper", viper_calls_viper, items, count=items )
+    run( "viper inline, no call", viper_inline, items, count=items )
+    run( "call viper from python loop", python_calls_viper, items, count=items )
+    run( "call viper in generator", consume_generator, items, count=items )
+    run( "call viper in coroutine", run_coroutine, coroutine_calls_viper, items, count=items )
+    run( "await async function calling viper", run_coroutine, coroutine_awaits, items, count=items )
+    run( "call viper and await sleep_ms(0)", run_coroutine, coroutine_sleeps, items, count=items )
+    return results
+
+if __name__ == "__main__":
+    run_all()
@@ -1,19 +1,8 @@
 # (c) 2023 Hermann Paul von Borries
 # MIT License
 
-class MeasureTime:
-    def __init__(self, title ):
-        self.title = title
-    def __enter__( self ):
-        self.t0 = time.ticks_us()
-        return self
-    def __exit__( self, exc_type, exc_val, exc_traceback ):
-        self.time_usec = time.ticks_diff( time.ticks_us(), self.t0 )
-        print(f"\tMeasureTime {self.title} {self.time_usec} usec" )
-
-
-import time
 import array
+import benchmark
 
 # Original python function
 def add_to_array( a, n ):
@@ -49,17 +38,16 @@ def viper_add_to_array( pa:ptr32, n:int, length:int)->int:
     
     
 my_array = array.array("l", (i for i in range(10000)))
-with MeasureTime("Plain") as plain:
-    print(add_to_array( my_array, 10 ))
-
-with MeasureTime("Native") as native:
-    print(native_add_to_array( my_array, 10 ))
+print(add_to_array( my_array, 10 ))
+print(native_add_to_array( my_array, 10 ))
+print(viper_add_to_array( my_array, 10, len(my_array) ))
 
-with MeasureTime("Viper") as viper:
-    print(viper_add_to_array( my_array, 10, len(my_array) ))
+plain = benchmark.run("Plain", add_to_array, my_array, 10 )
+native = benchmark.run("Native", native_add_to_array, my_array, 10 )
+viper = benchmark.run("Viper", viper_add_to_array, my_array, 10, len(my_array) )
 
-print(f"plain/native {plain.time_usec/native.time_usec}")
-print(f"plain/viper {plain.time_usec/viper.time_usec}")
+print(f"plain/native {benchmark.ratio(plain, native)}")
+print(f"plain/viper {benchmark.ratio(plain, viper)}")
 
 @micropython.viper
 def myfunction(my_argument):
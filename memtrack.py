@@ -0,0 +1,199 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Allocation tracking for viper kernels and DSP pipelines, to find the
+# calls that allocate memory and so cause garbage collection pauses.
+# Each profiled call reads gc.mem_alloc() and gc.mem_free() before and
+# after, and records the call count, the bytes allocated, the bytes of
+# free memory used, the number of calls that allocated and the number
+# of garbage collections in a preallocated array.
+#
+# Same use as profiler.py:
+#    import memtrack
+#    @memtrack.track("my_kernel", 3)
+#    @micropython.viper
+#    def my_kernel( a:ptr32, b:ptr32, n:int ):
+#        ...
+#    memtrack.instrument( fft_int, "_bit_reverse", 5 )
+#    region = memtrack.region("frame")  # once, outside the loop
+#    with region:
+#        ...
+# and then:
+#    memtrack.report()     print a table, the calls that allocate are flagged
+#    memtrack.flagged()    list of the names that allocated
+#    memtrack.reset()      zero all counters
+#
+# Both deltas are recorded since they differ on ports where the heap
+# can grow, there gc.mem_free() increases without a collection.
+# gc.mem_alloc() counts blocks of 16 bytes on most ports.
+#
+# MicroPython has no count of garbage collections. An unreachable
+# _Sentinel object with a finaliser is kept, a collection frees it and
+# its __del__ increments the count. A new sentinel is allocated before
+# the next tracked call, not during it. On ports without finalisers, or
+# if a stale pointer keeps the sentinel alive, a collection is still
+# detected when gc.mem_alloc() decreases during the call. The bytes
+# allocated by a call with a collection are unknown. A collection is
+# only done when an allocation does not fit, so that call is flagged
+# as allocating too.
+#
+# The second argument of track() and instrument() is the number of
+# arguments, see profiler.py. Without it each call allocates a tuple,
+# but before the first gc.mem_alloc(), so it is not counted.
+# The wrappers and regions are those of tracker.py, shared with
+# profiler.py.
+#
+# With VERBOSE = True, the first allocation of each name is printed.
+# Set memtrack.ENABLED = False before importing the modules to track:
+# track() then returns the function unchanged, instrument() does nothing
+# and region() returns a region that does not read gc.mem_alloc().
+import gc
+import array
+import tracker
+
+ENABLED = True
+VERBOSE = True
+# Maximum number of kernels or regions
+MAX_SLOTS = 32
+
+# Fields of each slot in _stats, the cumulative bytes are split
+# in a low and a high part, see tracker.py. LOW_MASK and LOW_SHIFT are
+# repeated here as constants for the viper code.
+COUNT = const(0)
+ALLOC_LOW = const(1)
+ALLOC_HIGH = const(2)
+ALLOC_MAX = const(3)
+FREE_LOW = const(4)
+FREE_HIGH = const(5)
+FREE_MAX = const(6)
+ALLOCATING = const(7)
+COLLECTIONS = const(8)
+FIELDS = const(9)
+LOW_MASK = const(0x3fffffff)
+LOW_SHIFT = const(30)
+
+mem_alloc = gc.mem_alloc
+mem_free = gc.mem_free
+
+# _gc[COLLECTED] counts the collections seen by _Sentinel,
+# _gc[ARMED] is 1 while a sentinel waits to be collected
+COLLECTED = const(0)
+ARMED = const(1)
+_gc = array.array("i", (0, 0))
+
+class _Sentinel:
+    # Called by the garbage collector, must not allocate
+    def __del__( self ):
+        _gc[COLLECTED] += 1
+        _gc[ARMED] = 0
+
+# Allocate a sentinel and drop it, see above
+def _arm():
+    _gc[ARMED] = 1
+    _Sentinel()
+
+# allocated: change of gc.mem_alloc(), used: decrease of gc.mem_free(),
+# collected: number of collections seen by the sentinel.
+# Returns 1 if this is the first allocating call of the slot.
+@micropython.viper
+def _record( stats:ptr32, slot:int, allocated:int, used:int, collected:int )->int:
+    i = slot*FIELDS
+    stats[i+COUNT] += 1
+    if allocated < 0 and collected == 0:
+        # A collection not seen by the sentinel
+        collected = 1
+    if collected:
+        stats[i+COLLECTIONS] += collected
+    else:
+        if allocated <= 0 and used <= 0:
+            return 0
+        if allocated > 0:
+            low = stats[i+ALLOC_LOW] + allocated
+            stats[i+ALLOC_LOW] = low & LOW_MASK
+            stats[i+ALLOC_HIGH] += low >> LOW_SHIFT
+            if allocated > stats[i+ALLOC_MAX]:
+                stats[i+ALLOC_MAX] = allocated
+        if used > 0:
+            low = stats[i+FREE_LOW] + used
+            stats[i+FREE_LOW] = low & LOW_MASK
+            stats[i+FREE_HIGH] += low >> LOW_SHIFT
+            if used > stats[i+FREE_MAX]:
+                stats[i+FREE_MAX] = used
+    stats[i+ALLOCATING] += 1
+    if stats[i+ALLOCATING] == 1:
+        return 1
+    return 0
+
+# Arm a sentinel if needed, and return the count of collections
+# before a tracked call
+def _collections():
+    if not _gc[ARMED]:
+        _arm()
+    return _gc[COLLECTED]
+
+# End of a tracked call, g0, a0 and f0 are _gc[COLLECTED],
+# gc.mem_alloc() and gc.mem_free() before the call
+def _stop( s, g0, a0, f0 ):
+    a1 = mem_alloc()
+    f1 = mem_free()
+    collected = _gc[COLLECTED] - g0
+    if _record( _stats, s, a1 - a0, f0 - f1, collected ):
+        if VERBOSE:
+            if collected or a1 < a0:
+                print(f"memtrack: {_names[s]} triggered a garbage collection")
+            else:
+                print(f"memtrack: {_names[s]} allocated {a1 - a0} bytes, mem_free decreased {f0 - f1} bytes")
+
+_tracker = tracker.Tracker( "memtrack", MAX_SLOTS, FIELDS, _collections, mem_alloc, mem_free, _stop )
+_stats = _tracker.stats
+_names = _tracker.names
+
+# Slot for name, a new one if the name is not known
+def slot( name ):
+    return _tracker.slot( name )
+
+# Decorator, see above
+def track( name, nargs=None ):
+    return _tracker.decorator( name, nargs, ENABLED )
+
+# Replace module.name by a tracking wrapper, the report shows it as
+# module_name.name. Returns the original function, to undo with
+# setattr( module, name, original ).
+def instrument( module, name, nargs=None ):
+    return _tracker.instrument( module, name, nargs, ENABLED )
+
+# Context manager that tracks the code in the with block.
+# Create it once, outside the loop to track.
+def region( name ):
+    return _tracker.region( name, ENABLED )
+
+# List of (name, count, alloc_bytes, alloc_max, free_bytes, free_max,
+# allocating_calls, collections). alloc_bytes is the sum of the increases
+# of gc.mem_alloc(), free_bytes the sum of the decreases of gc.mem_free(),
+# both without the calls with a collection.
+def results():
+    r = []
+    total = _tracker.total
+    for s, name in enumerate(_names):
+        i = s*FIELDS
+        r.append( ( name, _stats[i+COUNT],
+                    total( i, ALLOC_LOW, ALLOC_HIGH ), _stats[i+ALLOC_MAX],
+                    total( i, FREE_LOW, FREE_HIGH ), _stats[i+FREE_MAX],
+                    _stats[i+ALLOCATING], _stats[i+COLLECTIONS] ) )
+    return r
+
+# Names with at least one allocating call
+def flagged():
+    return [ r[0] for r in results() if r[6] > 0 ]
+
+# Print the results, sorted by bytes allocated, descending.
+# The names that allocated are marked with *
+def report():
+    print(f"  {'name':32} {'calls':>8} {'alloc':>10} {'per_call':>9} {'max':>8} {'free_used':>10} {'max':>8} {'allocating':>10} {'gc':>5}")
+    for name, count, alloc, alloc_max, free, free_max, allocating, collections in sorted( results(), key=lambda x: (x[2], x[6]), reverse=True ):
+        per_call = alloc/count if count else 0
+        mark = "*" if allocating else " "
+        print(f"{mark} {name:32} {count:8} {alloc:10} {per_call:9.1f} {alloc_max:8} {free:10} {free_max:8} {allocating:10} {collections:5}")
+
+def reset():
+    _tracker.reset()
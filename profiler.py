@@ -0,0 +1,137 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Profiler for viper kernels. ticks_ms can't resolve a kernel that takes
+# less than a millisecond, this records ticks_us and ticks_cpu per call.
+# For each kernel the call count, cumulative and maximum time are stored
+# in a preallocated array, there is no heap allocation between the two
+# readings of the clocks.
+#
+# Use as decorator:
+#    import profiler
+#    @profiler.profile("my_kernel", 3)
+#    @micropython.viper
+#    def my_kernel( a:ptr32, b:ptr32, n:int ):
+#        ...
+# or replace the functions of a module, this also profiles the calls
+# from inside the module, since viper looks up globals at each call:
+#    profiler.instrument( fft_int, "_fft_batch_radix4", 7 )
+# or time a region of code:
+#    region = profiler.region("filter loop")  # once, outside the loop
+#    with region:
+#        ...
+# and then:
+#    profiler.report()     print a table, sorted by cumulative time
+#    profiler.reset()      zero all counters
+#
+# The second argument of profile() and instrument() is the number of
+# arguments. With it, the wrapper has exactly that many arguments and
+# the call allocates nothing. Without it, the wrapper takes *args, and
+# each call allocates a tuple, before the timed region.
+# The wrappers and regions are those of tracker.py, shared with
+# memtrack.py. The times include the call of _stop, that reads the
+# clocks after the call.
+#
+# Set profiler.ENABLED = False before importing the modules to profile:
+# profile() then returns the function unchanged, instrument() does nothing
+# and region() returns a region that does not read the clocks, so the
+# profiled code runs with zero overhead.
+import time
+import tracker
+
+ENABLED = True
+# Maximum number of kernels or regions
+MAX_SLOTS = 32
+
+# Fields of each slot in _stats, the cumulative times are split
+# in a low and a high part, see tracker.py. LOW_MASK and LOW_SHIFT are
+# repeated here as constants for the viper code.
+COUNT = const(0)
+US_LOW = const(1)
+US_HIGH = const(2)
+US_MAX = const(3)
+CPU_LOW = const(4)
+CPU_HIGH = const(5)
+CPU_MAX = const(6)
+FIELDS = const(7)
+LOW_MASK = const(0x3fffffff)
+LOW_SHIFT = const(30)
+
+ticks_us = time.ticks_us
+ticks_diff = time.ticks_diff
+try:
+    ticks_cpu = time.ticks_cpu
+except AttributeError:
+    # Some ports don't have ticks_cpu
+    ticks_cpu = time.ticks_us
+
+@micropython.viper
+def _record( stats:ptr32, slot:int, us:int, cpu:int ):
+    i = slot*FIELDS
+    stats[i+COUNT] += 1
+    low = stats[i+US_LOW] + us
+    stats[i+US_LOW] = low & LOW_MASK
+    stats[i+US_HIGH] += low >> LOW_SHIFT
+    if us > stats[i+US_MAX]:
+        stats[i+US_MAX] = us
+    low = stats[i+CPU_LOW] + cpu
+    stats[i+CPU_LOW] = low & LOW_MASK
+    stats[i+CPU_HIGH] += low >> LOW_SHIFT
+    if cpu > stats[i+CPU_MAX]:
+        stats[i+CPU_MAX] = cpu
+
+# Only two counters are needed, the first reading is not used
+def _unused():
+    return 0
+
+# Both clocks are read before and after the call, in reverse order,
+# so that each one measures the call and the reading of the other clock.
+def _stop( s, unused, u0, c0 ):
+    c1 = ticks_cpu()
+    u1 = ticks_us()
+    _record( _stats, s, ticks_diff( u1, u0 ), ticks_diff( c1, c0 ) )
+
+_tracker = tracker.Tracker( "profiler", MAX_SLOTS, FIELDS, _unused, ticks_us, ticks_cpu, _stop )
+_stats = _tracker.stats
+_names = _tracker.names
+
+# Slot for name, a new one if the name is not known
+def slot( name ):
+    return _tracker.slot( name )
+
+# Decorator, see above
+def profile( name, nargs=None ):
+    return _tracker.decorator( name, nargs, ENABLED )
+
+# Replace module.name by a profiled wrapper, the report shows it as
+# module_name.name. Returns the original function, to undo with
+# setattr( module, name, original ).
+def instrument( module, name, nargs=None ):
+    return _tracker.instrument( module, name, nargs, ENABLED )
+
+# Context manager that profiles the code in the with block.
+# Create it once, outside the loop to profile.
+def region( name ):
+    return _tracker.region( name, ENABLED )
+
+# List of (name, count, total_us, max_us, total_cpu, max_cpu)
+def results():
+    r = []
+    total = _tracker.total
+    for s, name in enumerate(_names):
+        i = s*FIELDS
+        r.append( ( name, _stats[i+COUNT],
+                    total( i, US_LOW, US_HIGH ), _stats[i+US_MAX],
+                    total( i, CPU_LOW, CPU_HIGH ), _stats[i+CPU_MAX] ) )
+    return r
+
+# Print the results, sorted by cumulative time, descending.
+# key: column to sort by, 2=total_us, 3=max_us, 4=total_cpu, 5=max_cpu
+def report( key=2 ):
+    print(f"{'name':32} {'calls':>8} {'total_us':>10} {'mean_us':>9} {'max_us':>8} {'total_cpu':>12} {'max_cpu':>10}")
+    for name, count, total_us, max_us, total_cpu, max_cpu in sorted( results(), key=lambda x: x[key], reverse=True ):
+        mean_us = total_us/count if count else 0
+        print(f"{name:32} {count:8} {total_us:10} {mean_us:9.1f} {max_us:8} {total_cpu:12} {max_cpu:10}")
+
+def reset():
+    _tracker.reset()
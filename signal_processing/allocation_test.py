@@ -0,0 +1,80 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Test that the steady state FFT and autocorrelation paths allocate
+# no memory, so that processing a stream of frames causes no garbage
+# collection pauses. The first frames create the plans, windows and
+# buffers, the next frames are tracked with memtrack.py.
+# The default calls, without typecode, are tested too: the typecode
+# of the input arrays is cached, see fft_int.sample_typecode.
+# Run on the unix port or on the board with: micropython allocation_test.py
+import sys
+import array
+import random
+import fft_int
+import autocorrelation
+sys.path.append("..")
+import memtrack
+
+N = 256
+AUTOCORRELATION_SIZE = 128
+WARMUP = 2
+FRAMES = 10
+
+data = array.array("i", (random.randint(-2047, 2047) for _ in range(N)))
+data16 = array.array("h", data)
+real = array.array("i", (0 for _ in range(N)))
+imag = array.array("i", real)
+power = array.array("I", (0 for _ in range(N//2)))
+auto_signal = array.array("i", (0 for _ in range(AUTOCORRELATION_SIZE)))
+plan = fft_int.get_plan( N )
+
+regions = [ memtrack.region( name ) for name in
+            ( "fft", "fft hann", "fft 16 bit", "rfft", "rfft hann", "fft_inplace",
+              "fft_power", "buffers fft", "autocorrelation", "autocorrelation_fft",
+              "fft default", "fft 16 bit default", "rfft default", "buffers rfft default" ) ]
+fft_region, hann_region, fft16_region, rfft_region, rfft_hann_region, inplace_region, \
+    power_region, buffers_region, auto_region, auto_fft_region, \
+    default_region, default16_region, rfft_default_region, buffers_default_region = regions
+
+for frame in range(WARMUP+FRAMES):
+    if frame == WARMUP:
+        memtrack.reset()
+    with fft_region:
+        result = fft_int.fft( data, typecode="i" )
+    with hann_region:
+        fft_int.fft( data, hann_windowing=True, typecode="i" )
+    with fft16_region:
+        fft_int.fft( data16, typecode="h" )
+    with rfft_region:
+        fft_int.rfft( data, typecode="i" )
+    with rfft_hann_region:
+        plan.rfft( data, hann_windowing=True, typecode="i" )
+    with inplace_region:
+        fft_int.array_copy( data, real, N )
+        fft_int.array_zero( imag, N )
+        plan.fft_inplace( real, imag )
+    with power_region:
+        fft_int.fft_power( real, imag, 0, N//2, power )
+    with buffers_region:
+        with plan.buffers() as b:
+            b.fft( data, typecode="i" )
+    with auto_region:
+        autocorrelation.autocorrelation( data, AUTOCORRELATION_SIZE, auto_signal )
+    with auto_fft_region:
+        autocorrelation.autocorrelation_fft( data, AUTOCORRELATION_SIZE, auto_signal )
+    with default_region:
+        fft_int.fft( data )
+    with default16_region:
+        fft_int.fft( data16, hann_windowing=True )
+    with rfft_default_region:
+        fft_int.rfft( data )
+    with buffers_default_region:
+        with plan.buffers() as b:
+            b.rfft( data16 )
+
+memtrack.report()
+for result in memtrack.results():
+    assert result[1] == FRAMES, result[0]
+assert memtrack.flagged() == [], memtrack.flagged()
+print(f"allocation test complete, {FRAMES} frames without allocation")
@@ -14,7 +14,11 @@
 # the maximum value possible of the signal to prevent overflow.
 # Since raw ADC signals are many times unsigned 12 bits, it can be better
 # to scale those values to be from -2047 to +2048 or to scale those down
-# so no overflow will occur.
+# so no overflow will occur. Or use autocorrelation64, which accepts
+# full scale 16 bit samples and returns 64 bit results.
+
+import array
+import fft_int
 
 @micropython.viper
 def autocorrelation( signal:ptr32, size:int, auto_signal:ptr32):
@@ -36,3 +40,328 @@ def autocorrelation( signal:ptr32, size:int, auto_signal:ptr32):
         auto_signal[lag] +=  sum_signal
         lag += 1
 
+
+# Same as autocorrelation, for 16 and 8 bit samples, for example
+# an array.array("h") filled by the ADC. sign is fft_int.SIGN16 or
+# fft_int.SIGN8 for signed samples, 0 for unsigned samples.
+@micropython.viper
+def autocorrelation16( signal:ptr16, size:int, auto_signal:ptr32, sign:int ):
+    lag:int = 0
+    while lag < size:
+        sum_signal: int = 0
+        p1:uint = uint(signal)
+        p2:uint = uint(signal)+lag*2
+        lim_p1:uint = p1 + (size-lag)*2
+        while p1 < lim_p1:
+            sum_signal += ((int(ptr16(p1)[0]) ^ sign) - sign) * ((int(ptr16(p2)[0]) ^ sign) - sign)
+            p1 += 2
+            p2 += 2
+        auto_signal[lag] = sum_signal
+        lag += 1
+
+@micropython.viper
+def autocorrelation8( signal:ptr8, size:int, auto_signal:ptr32, sign:int ):
+    lag:int = 0
+    while lag < size:
+        sum_signal: int = 0
+        p1:uint = uint(signal)
+        p2:uint = uint(signal)+lag
+        lim_p1:uint = p1 + (size-lag)
+        while p1 < lim_p1:
+            sum_signal += ((int(ptr8(p1)[0]) ^ sign) - sign) * ((int(ptr8(p2)[0]) ^ sign) - sign)
+            p1 += 1
+            p2 += 1
+        auto_signal[lag] = sum_signal
+        lag += 1
+
+# Autocorrelation with the kernel for the typecode of signal,
+# see fft_int.array_copy_typed
+def autocorrelation_typed( signal, size, auto_signal, typecode=None ):
+    if typecode is None:
+        typecode = fft_int.sample_typecode( signal )
+    if typecode in ("h", "H"):
+        autocorrelation16( signal, size, auto_signal, fft_int._sign( typecode ) )
+    elif typecode in ("b", "B"):
+        autocorrelation8( signal, size, auto_signal, fft_int._sign( typecode ) )
+    elif typecode in ("i", "I", "l", "L"):
+        autocorrelation( signal, size, auto_signal )
+    else:
+        # Lists and float arrays
+        raise ValueError
+
+# Autocorrelation for lags min_lag to max_lag only, for example the lags
+# of the pitch range of interest. auto_signal[lag-min_lag] gets the value
+# for lag, so auto_signal needs max_lag-min_lag+1 elements.
+# max_lag must be less than size.
+@micropython.viper
+def autocorrelation_lags( signal:ptr32, size:int, auto_signal:ptr32, min_lag:int, max_lag:int ):
+    lag:int = min_lag
+    while lag <= max_lag:
+        sum_signal: int = 0
+        p1:uint = uint(signal)
+        p2:uint = uint(signal)+lag*4
+        lim_p1:uint = p1 + (size-lag)*4
+        while p1 < lim_p1:
+            sum_signal += ptr32(p1)[0] * ptr32(p2)[0]
+            p1 += 4
+            p2 += 4
+        auto_signal[lag-min_lag] = sum_signal
+        lag += 1
+
+# Add the samples block[0:count] to the sliding window held in ring.
+# For each sample, the products of the new sample are added to the sums
+# and the products of the sample leaving the window are subtracted.
+# Returns the new position of the oldest sample in ring.
+@micropython.viper
+def _sliding_update( ring:ptr32, window:int, position:int, block:ptr32, count:int, sums:ptr32, min_lag:int, max_lag:int )->int:
+    i:int = 0
+    while i < count:
+        new:int = block[i]
+        old:int = ring[position]
+        lag:int = min_lag
+        if lag == 0:
+            sums[0] += new*new - old*old
+            lag = 1
+        # Position of the sample lag places after the oldest and of
+        # the sample lag places before the new sample
+        after:int = position + lag
+        if after >= window:
+            after -= window
+        before:int = position - lag
+        if before < 0:
+            before += window
+        while lag <= max_lag:
+            sums[lag-min_lag] += new*ring[before] - old*ring[after]
+            after += 1
+            if after >= window:
+                after = 0
+            before -= 1
+            if before < 0:
+                before = window - 1
+            lag += 1
+        ring[position] = new
+        position += 1
+        if position >= window:
+            position = 0
+        i += 1
+    return position
+
+# Autocorrelation of the last window samples of a stream, for the lags
+# min_lag to max_lag, updated as each block of samples arrives.
+# The cost per block is O(block size*number of lags) instead of
+# O(window**2). After update(), sums[lag-min_lag] is equal to
+# the result of autocorrelation_lags for the last window samples.
+class SlidingAutocorrelation:
+    def __init__( self, window, min_lag, max_lag ):
+        if min_lag < 0 or max_lag < min_lag or max_lag >= window:
+            raise ValueError
+        self.window = window
+        self.min_lag = min_lag
+        self.max_lag = max_lag
+        self.ring = array.array("i", (0 for _ in range(window)))
+        self.position = 0
+        self.sums = array.array("i", (0 for _ in range(max_lag-min_lag+1)))
+
+    # block: array.array("i") with the new samples, count: number
+    # of samples of block to use.
+    def update( self, block, count ):
+        if count > len(block):
+            raise ValueError
+        self.position = _sliding_update( self.ring, self.window, self.position, block, count, self.sums, self.min_lag, self.max_lag )
+
+    # Autocorrelation value for lag
+    def value( self, lag ):
+        return self.sums[lag-self.min_lag]
+
+# Overflow safe autocorrelation and dot product for raw 16 bit samples.
+# The sums are accumulated in a pair of 32 bit ints: hi gets the
+# products shifted right by 16 bits, lo the lower 16 bits of the products.
+# lo is added to hi every ACCUMULATE_CHUNK products so that
+# it cannot overflow. The result has 48 bits.
+# Samples must be 16 bit values, from -32768 to 32767, or from 0 to
+# 65535 for autocorrelation64_16 with unsigned samples.
+ACCUMULATE_CHUNK = const(16384)
+
+# Store hi*65536+lo as 64 bit integer at result[0] (low 32 bits)
+# and result[1] (high 32 bits)
+@micropython.viper
+def _store64( result:ptr32, hi:int, lo:int ):
+    hi += lo>>16
+    lo = lo & 0xffff
+    result[0] = (hi<<16) | lo
+    result[1] = hi>>16
+
+# Sum of a[i]*b[i] for i < n as 64 bit integer.
+# result: array.array("q") of one element, or array.array("i") of two.
+@micropython.viper
+def dot_product64( a:ptr32, b:ptr32, n:int, result:ptr32 ):
+    hi:int = 0
+    lo:int = 0
+    i:int = 0
+    while i < n:
+        limit:int = i + ACCUMULATE_CHUNK
+        if limit > n:
+            limit = n
+        while i < limit:
+            product:int = a[i]*b[i]
+            hi += product>>16
+            lo += product & 0xffff
+            i += 1
+        hi += lo>>16
+        lo = lo & 0xffff
+    _store64( result, hi, lo )
+
+# Same as autocorrelation, but with 64 bit results.
+# auto_signal: array.array("q") of size elements,
+# or array.array("i") of 2*size elements, low 32 bits first.
+@micropython.viper
+def autocorrelation64( signal:ptr32, size:int, auto_signal:ptr32 ):
+    lag:int = 0
+    while lag < size:
+        hi:int = 0
+        lo:int = 0
+        p1:uint = uint(signal)
+        p2:uint = uint(signal)+lag*4
+        lim_p1:uint = p1 + (size-lag)*4
+        while p1 < lim_p1:
+            lim_chunk:uint = p1 + ACCUMULATE_CHUNK*4
+            if lim_chunk > lim_p1:
+                lim_chunk = lim_p1
+            while p1 < lim_chunk:
+                product:int = ptr32(p1)[0] * ptr32(p2)[0]
+                hi += product>>16
+                lo += product & 0xffff
+                p1 += 4
+                p2 += 4
+            hi += lo>>16
+            lo = lo & 0xffff
+        _store64( ptr32(uint(auto_signal)+lag*8), hi, lo )
+        lag += 1
+
+# Same as autocorrelation64, for 16 bit samples, for example an
+# array.array("h") or array.array("H") filled by the ADC, without a 32 bit
+# copy. sign is fft_int.SIGN16 for signed samples, 0 for unsigned samples.
+# Unsigned samples up to 65535 are multiplied as uint, their product
+# does not fit in an int.
+@micropython.viper
+def autocorrelation64_16( signal:ptr16, size:int, auto_signal:ptr32, sign:int ):
+    lag:int = 0
+    while lag < size:
+        hi:int = 0
+        lo:int = 0
+        p1:uint = uint(signal)
+        p2:uint = uint(signal)+lag*2
+        lim_p1:uint = p1 + (size-lag)*2
+        while p1 < lim_p1:
+            lim_chunk:uint = p1 + ACCUMULATE_CHUNK*2
+            if lim_chunk > lim_p1:
+                lim_chunk = lim_p1
+            if sign:
+                while p1 < lim_chunk:
+                    product:int = ((int(ptr16(p1)[0]) ^ sign) - sign) * ((int(ptr16(p2)[0]) ^ sign) - sign)
+                    hi += product>>16
+                    lo += product & 0xffff
+                    p1 += 2
+                    p2 += 2
+            else:
+                while p1 < lim_chunk:
+                    uproduct:uint = uint(ptr16(p1)[0]) * uint(ptr16(p2)[0])
+                    hi += int(uproduct>>16)
+                    lo += int(uproduct & 0xffff)
+                    p1 += 2
+                    p2 += 2
+            hi += lo>>16
+            lo = lo & 0xffff
+        _store64( ptr32(uint(auto_signal)+lag*8), hi, lo )
+        lag += 1
+
+# autocorrelation64 with the kernel for the typecode of signal,
+# see fft_int.array_copy_typed
+def autocorrelation64_typed( signal, size, auto_signal, typecode=None ):
+    if typecode is None:
+        typecode = fft_int.sample_typecode( signal )
+    if typecode in ("h", "H"):
+        autocorrelation64_16( signal, size, auto_signal, fft_int._sign( typecode ) )
+    elif typecode in ("i", "I", "l", "L"):
+        autocorrelation64( signal, size, auto_signal )
+    else:
+        raise ValueError
+
+# Copy signal[0:size] to real, zeros to real[size:n] and to imag[0:n]
+@micropython.viper
+def _zero_padded_copy( signal:ptr32, size:int, real:ptr32, imag:ptr32, n:int ):
+    i:int = 0
+    while i < n:
+        if i < size:
+            real[i] = signal[i]
+        else:
+            real[i] = 0
+        imag[i] = 0
+        i += 1
+
+# real = (real**2+imag**2)/2, imag = 0
+# The complex magnitude after a block floating point FFT is less than
+# 65536, so the power is less than 2**32 and, divided by 2, fits in an int.
+@micropython.viper
+def _half_power( real:ptr32, imag:ptr32, n:int ):
+    i:int = 0
+    while i < n:
+        x:int = real[i]
+        y:int = imag[i]
+        real[i] = int((uint(x*x) + uint(y*y))>>1)
+        imag[i] = 0
+        i += 1
+
+# auto_signal[0:size] = real[0:size]*2**shift
+@micropython.viper
+def _scale( real:ptr32, size:int, shift:int, auto_signal:ptr32 ):
+    i:int = 0
+    if shift >= 0:
+        while i < size:
+            auto_signal[i] = real[i]<<shift
+            i += 1
+    else:
+        right:int = 0 - shift
+        rounding:int = 1<<(right-1)
+        while i < size:
+            auto_signal[i] = (real[i] + rounding)>>right
+            i += 1
+
+# Autocorrelation with the FFT, O(n*log(n)) instead of O(n**2).
+# Same arguments and result as autocorrelation(), computed as
+# ifft(abs(fft(signal))**2), with the signal padded with zeros to at least
+# 2*size so that the circular correlation of the FFT equals the
+# linear one. Uses block floating point, so the result has about 14 bits
+# of precision relative to auto_signal[0], the largest value.
+# The scratch buffers are taken from the FFTPlan pool, no memory is
+# allocated once the plan exists.
+def autocorrelation_fft( signal, size, auto_signal ):
+    n = 4
+    log2n = 2
+    while n < 2*size:
+        n *= 2
+        log2n += 1
+    plan = fft_int.get_plan( n )
+    with plan.buffers() as b:
+        real = b.real
+        imag = b.imag
+        _zero_padded_copy( signal, size, real, imag, n )
+        # X = fft(signal) = real/imag*2**e1
+        e1 = plan.fft_inplace_bfp( real, imag )
+        # abs(X)**2 = power*2**(2*e1+1)
+        _half_power( real, imag, n )
+        # n*ifft(power) = real*2**e2
+        e2 = plan.ifft_inplace_bfp( real, imag )
+        _scale( real, size, e2 + 2*e1 + 1 - log2n, auto_signal )
+
+# Signal size from where autocorrelation_fft is faster than
+# autocorrelation. Run autocorrelation_benchmark.py to get the value for
+# a specific board and change it if needed.
+fft_crossover = 128
+
+# Autocorrelation with the faster of both methods for this size
+def autocorrelation_auto( signal, size, auto_signal ):
+    if size < fft_crossover:
+        autocorrelation( signal, size, auto_signal )
+    else:
+        autocorrelation_fft( signal, size, auto_signal )
@@ -0,0 +1,34 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Compare direct and FFT autocorrelation to find the size where
+# autocorrelation_fft becomes faster than autocorrelation.
+# Run on the unix port or on the board with: micropython autocorrelation_benchmark.py
+import sys
+import array
+import random
+import autocorrelation
+sys.path.append("..")
+import benchmark
+
+REPEAT = 5
+
+crossover = None
+for size in (16, 32, 64, 128, 256, 512, 1024):
+    print(f"Autocorrelation size {size}, {REPEAT} repetitions")
+    # 12 bit signal, as recommended for autocorrelation()
+    signal = array.array("i", (random.randint(-2047, 2047) for _ in range(size)))
+    direct_result = array.array("i", (0 for _ in range(size)))
+    fft_result = array.array("i", direct_result)
+    # Create the plan before measuring
+    autocorrelation.autocorrelation_fft( signal, size, fft_result )
+
+    direct = benchmark.run(f"autocorrelation direct size={size}", autocorrelation.autocorrelation, signal, size, direct_result, repeat=REPEAT )
+    fft = benchmark.run(f"autocorrelation fft size={size}", autocorrelation.autocorrelation_fft, signal, size, fft_result, repeat=REPEAT )
+
+    error = max( abs(direct_result[i]-fft_result[i]) for i in range(size) )
+    print(f"\tdirect/fft {benchmark.ratio(direct, fft):.2f}, largest difference {error/direct_result[0]*100:.3f}% of auto_signal[0]")
+    if crossover is None and fft["min_us"] < direct["min_us"]:
+        crossover = size
+
+print(f"Set autocorrelation.fft_crossover = {crossover}")
@@ -0,0 +1,48 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Stress test: several asyncio tasks compute FFTs of different signals
+# with the same plan and keep the results while other tasks run.
+import asyncio
+import array
+import random
+from math import sin, pi
+import fft_int
+
+N = 256
+TASKS = 6
+ROUNDS = 20
+
+def peak_bin( real, imag, n ):
+    best = 0
+    best_power = -1
+    for i in range(1, n//2):
+        power = real[i]*real[i] + imag[i]*imag[i]
+        if power > best_power:
+            best_power = power
+            best = i
+    return best
+
+async def sensor_task( task_number, plan ):
+    # Each task has its own tone, i.e. its own FFT peak
+    tone = 5 + 7*task_number
+    data = array.array("i", (round(10000*sin(2*pi*tone*i/N)) for i in range(N)))
+    for _ in range(ROUNDS):
+        with plan.buffers() as b:
+            real, imag = b.rfft( data ) if task_number % 2 else b.fft( data )
+            # Let the other tasks compute their FFTs in between
+            await asyncio.sleep_ms( random.randint(0, 3) )
+            assert peak_bin( real, imag, N ) == tone
+            await asyncio.sleep_ms( 0 )
+            assert peak_bin( real, imag, N ) == tone
+    return task_number
+
+async def main():
+    plan = fft_int.get_plan( N )
+    results = await asyncio.gather( *(sensor_task( t, plan ) for t in range(TASKS)) )
+    assert list(results) == list(range(TASKS))
+    # Each task holds at most one FFTBuffers at a time
+    assert len(plan._pool) <= TASKS
+    print(f"fft asyncio test complete, {len(plan._pool)} buffers in pool")
+
+asyncio.run(main())
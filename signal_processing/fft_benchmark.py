@@ -0,0 +1,50 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Compare the recursive _fftint with the iterative, in-place _fft_inplace.
+# Run on the unix port with: micropython fft_benchmark.py
+import sys
+import array
+from math import sin, pi
+import fft_int
+sys.path.append("..")
+import benchmark
+
+REPEAT = 20
+
+def test_signal( n ):
+    return array.array("i", (round(8000*sin(2*pi*3*i/n) + 4000*sin(2*pi*17*i/n)) for i in range(n)))
+
+def recursive_fft( data, buf_real, buf_imag, out_real, out_imag, n ):
+    # This is what fft() used to do
+    fft_int.array_copy( data, buf_real, n )
+    fft_int.array_copy( buf_real, out_real, n )
+    fft_int.array_zero( buf_imag, n )
+    fft_int.array_zero( out_imag, n )
+    fft_int._fftint( buf_real, buf_imag, out_real, out_imag, n, 1, fft_int.get_cos_table() )
+
+def iterative_fft( data, real, imag, n, plan ):
+    fft_int.array_copy( data, real, n )
+    fft_int.array_zero( imag, n )
+    fft_int._bit_reverse( real, imag, n, plan.bit_reverse, 0 )
+    fft_int._fft_inplace( real, imag, n, plan.cos_table, n, 0 )
+
+for n in (64, 256, 1024):
+    print(f"FFT size {n}, {REPEAT} repetitions")
+    data = test_signal( n )
+    buf_real = array.array("i", (0 for _ in range(n)))
+    buf_imag = array.array("i", buf_real)
+    out_real = array.array("i", buf_real)
+    out_imag = array.array("i", buf_real)
+    real = array.array("i", buf_real)
+    imag = array.array("i", buf_real)
+    plan = fft_int.get_plan( n )
+
+    recursive = benchmark.run(f"recursive _fftint, 4 buffers, n={n}", recursive_fft, data, buf_real, buf_imag, out_real, out_imag, n, repeat=REPEAT )
+    iterative = benchmark.run(f"iterative _fft_inplace, 2 buffers, n={n}", iterative_fft, data, real, imag, n, plan, repeat=REPEAT )
+
+    # Both use the same arithmetic, results must be identical.
+    # The quarter wave table of the plan has exactly the values of cos_table
+    # needed for size n
+    assert buf_real == real and buf_imag == imag
+    print(f"\trecursive/iterative {benchmark.ratio(recursive, iterative):.2f}")
@@ -2,7 +2,7 @@
 # MIT License
 # This is a example for FFT (Fast Fourier Transform) using 
 # MicroPython code emitter
-from math import  cos, pi, sqrt
+from math import  cos, pi, sqrt, log
 import array
 
 # Size of the input signal buffer
@@ -13,7 +13,17 @@ HALF_BUFFER_SIZE = const(512) # must be BUFFER_SIZE//2
 # Have cosine function precalculated 
 COS_TABLE_FACTOR = const(16384)
 COS_TABLE_FACTOR_HALF = const(8192) # half of COS_TABLE_FACTOR
-cos_table = array.array("H", (round(cos(-pi*i/BUFFER_SIZE)*COS_TABLE_FACTOR + COS_TABLE_FACTOR) for i in range(BUFFER_SIZE)))
+COS_TABLE_SHIFT = const(14) # COS_TABLE_FACTOR == 1<<COS_TABLE_SHIFT
+# The full table of BUFFER_SIZE entries is only needed by _fftint and
+# apply_hann_windowing, the plans use quarter_wave_table, so it is
+# built on first use, see get_cos_table.
+_cos_table = None
+
+def get_cos_table():
+    global _cos_table
+    if _cos_table is None:
+        _cos_table = array.array("H", (round(cos(-pi*i/BUFFER_SIZE)*COS_TABLE_FACTOR + COS_TABLE_FACTOR) for i in range(BUFFER_SIZE)))
+    return _cos_table
 
 
 #void _fft(cplx buf[], cplx out[], int n, int step)
@@ -87,6 +97,384 @@ def _fftint( buf_real:ptr32, buf_imag:ptr32, out_real:ptr32, out_imag:ptr32, n:i
 #}
 
 
+# Bit reversal permutation table for a FFT of size n
+def bit_reverse_table( n ):
+    bits = 0
+    while (1<<bits) < n:
+        bits += 1
+    if (1<<bits) != n:
+        # Only powers of two are supported
+        raise ValueError
+    table = array.array("H", (0 for _ in range(n)))
+    for i in range(n):
+        r = 0
+        x = i
+        for _ in range(bits):
+            r = (r<<1) | (x & 1)
+            x >>= 1
+        table[i] = r
+    return table
+
+# Quarter wave table for the kernels that have a table_size argument,
+# with n//4+1 entries cos(2*pi*i/n)*COS_TABLE_FACTOR for i = 0 to n//4,
+# 4 times less memory than a full cos_table. The entries are from 0 to
+# COS_TABLE_FACTOR, so they can be read with a ptr16 without sign extension.
+# For 0 <= k <= n//2, by symmetry:
+#    cos(2*pi*k/n) = table[k] if k <= n//4 else -table[n//2-k]
+#    sin(2*pi*k/n) = table[n//4-k] if k <= n//4 else table[k-n//4]
+# n must be a multiple of 4.
+def quarter_wave_table( n ):
+    if n & 3:
+        raise ValueError
+    return array.array("h", (round(cos(2*pi*i/n)*COS_TABLE_FACTOR) for i in range(n//4+1)))
+
+# cos(2*pi*k/n)*COS_TABLE_FACTOR for any k, from a quarter_wave_table
+def table_cos( table, n, k ):
+    quarter = n//4
+    k = k % n
+    if k > 2*quarter:
+        k = n - k
+    if k <= quarter:
+        return table[k]
+    return -table[2*quarter-k]
+
+# Reorder data to bit reversed index order, in place.
+# The bit reversal table of size 2*n also works for size n
+# with shift=1, since its first n entries are all even.
+@micropython.viper
+def _bit_reverse( real:ptr32, imag:ptr32, n:int, bit_reverse:ptr16, shift:int ):
+    i:int = 0
+    while i < n:
+        j:int = int(bit_reverse[i])>>shift
+        if i < j:
+            t:int = real[i]
+            real[i] = real[j]
+            real[j] = t
+            t = imag[i]
+            imag[i] = imag[j]
+            imag[j] = t
+        i = i + 1
+
+# Iterative, in-place radix-2 Cooley-Tukey FFT.
+# The input must be in bit reversed order (see _bit_reverse), the
+# output is in natural order. Uses the same arithmetic as _fftint, so
+# the result is also scaled down by n, but needs no out_real/out_imag
+# buffers and no recursive calls.
+# cos_table is a quarter_wave_table( table_size ), table_size must
+# be a multiple of n.
+# With inverse=1 the twiddle factors are conjugated, this computes
+# the inverse FFT, (1/n)*sum(X[k]*e**(2i*pi*j*k/n)), with no further scaling.
+@micropython.viper
+def _fft_inplace( real:ptr32, imag:ptr32, n:int, cos_table:ptr16, table_size:int, inverse:int ):
+    table_half:int = table_size>>1
+    table_quarter:int = table_size>>2
+    half:int = 1
+    while half < n:
+        step:int = half*2
+        # Multiplier to index sin/cos table with j
+        multiple:int = table_size//step
+        j:int = 0
+        while j < half:
+            # Calculate (expo_real, expo_imag) = e**(-i*pi*j/half)
+            # once for all butterflies of this stage that use it
+            k:int = j*multiple
+            expo_real:int = 0
+            expo_imag:int = 0
+            if k <= table_quarter:
+                expo_real = int(cos_table[k])
+                expo_imag = 0 - int(cos_table[table_quarter-k])
+            else:
+                expo_real = 0 - int(cos_table[table_half-k])
+                expo_imag = 0 - int(cos_table[k-table_quarter])
+            if inverse:
+                expo_imag = 0-expo_imag
+            i:int = j
+            while i < n:
+                i2:int = i + half
+                # Same as _fftint, but with shifts instead of
+                # divisions by powers of two
+                t_real:int = ((expo_real*real[i2]>>1) - (expo_imag*imag[i2]>>1) + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                t_imag:int = ((expo_imag*real[i2]>>1) + (expo_real*imag[i2]>>1) + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                u_real:int = real[i]>>1
+                u_imag:int = imag[i]>>1
+                real[i] = u_real + t_real
+                imag[i] = u_imag + t_imag
+                real[i2] = u_real - t_real
+                imag[i2] = u_imag - t_imag
+                i = i + step
+            j = j + 1
+        half = step
+
+# Radix-4 version of _fft_inplace, same result except for rounding. The input must be in bit reversed order (the usual
+# radix-2 bit reversal). If log2(n) is odd, the first stage is radix-2.
+# Each radix-4 stage combines 4 DFTs of size quarter, A0, A2, A1 and A3
+# in this order in memory (bit reversed), into one DFT of size 4*quarter
+# with 3 complex multiplications per butterfly instead of 4 for
+# two radix-2 stages, and with half the passes over memory.
+# The stages with only trivial twiddle factors (the radix-2 stage, the first
+# radix-4 stage and j == 0 of all stages) have no multiplications.
+# length is a multiple of n, length//n FFTs of consecutive blocks of n
+# elements are computed, with one twiddle factor lookup for all blocks.
+@micropython.viper
+def _fft_batch_radix4( real:ptr32, imag:ptr32, n:int, length:int, cos_table:ptr16, table_size:int, inverse:int ):
+    table_half:int = table_size>>1
+    table_quarter:int = table_size>>2
+    bits:int = 0
+    while (1<<bits) < n:
+        bits = bits + 1
+    quarter:int = 1
+    i:int = 0
+    if bits & 1:
+        # Radix-2 stage, twiddle factor 1
+        while i < length:
+            a:int = real[i]
+            b:int = real[i+1]
+            real[i] = (a + b)>>1
+            real[i+1] = (a - b)>>1
+            a = imag[i]
+            b = imag[i+1]
+            imag[i] = (a + b)>>1
+            imag[i+1] = (a - b)>>1
+            i = i + 2
+        quarter = 2
+    while quarter < n:
+        step:int = quarter*4
+        # cos_table index for e**(-i*pi*j/(2*quarter)) is j*multiple
+        multiple:int = table_size//step
+        # Offsets of X[j+quarter] and X[j+3*quarter], -i and +i times u3.
+        # The inverse FFT swaps these.
+        out1:int = quarter
+        out3:int = 3*quarter
+        if inverse:
+            out1 = 3*quarter
+            out3 = quarter
+        j:int = 0
+        while j < quarter:
+            # Twiddle factors W**j, W**(2*j) and W**(3*j),
+            # W = e**(-i*pi/(2*quarter)), scaled by COS_TABLE_FACTOR
+            w1_real:int = COS_TABLE_FACTOR
+            w1_imag:int = 0
+            w2_real:int = COS_TABLE_FACTOR
+            w2_imag:int = 0
+            w3_real:int = COS_TABLE_FACTOR
+            w3_imag:int = 0
+            if j != 0:
+                # k is at most table_size/4 for W**j, table_size/2 for
+                # W**(2*j) and 3*table_size/4 for W**(3*j)
+                k:int = j*multiple
+                w1_real = int(cos_table[k])
+                w1_imag = 0 - int(cos_table[table_quarter-k])
+                k = k + k
+                if k <= table_quarter:
+                    w2_real = int(cos_table[k])
+                    w2_imag = 0 - int(cos_table[table_quarter-k])
+                else:
+                    w2_real = 0 - int(cos_table[table_half-k])
+                    w2_imag = 0 - int(cos_table[k-table_quarter])
+                k = j*multiple*3
+                if k <= table_quarter:
+                    w3_real = int(cos_table[k])
+                    w3_imag = 0 - int(cos_table[table_quarter-k])
+                elif k <= table_half:
+                    w3_real = 0 - int(cos_table[table_half-k])
+                    w3_imag = 0 - int(cos_table[k-table_quarter])
+                else:
+                    # cos and sin are both negative
+                    w3_real = 0 - int(cos_table[k-table_half])
+                    w3_imag = int(cos_table[table_half+table_quarter-k])
+                if inverse:
+                    w1_imag = 0 - w1_imag
+                    w2_imag = 0 - w2_imag
+                    w3_imag = 0 - w3_imag
+            i = j
+            while i < length:
+                i1:int = i + quarter
+                i2:int = i1 + quarter
+                i3:int = i2 + quarter
+                # t0 = A0, t1 = W**j*A1, t2 = W**(2*j)*A2, t3 = W**(3*j)*A3
+                t0_real:int = real[i]
+                t0_imag:int = imag[i]
+                t1_real:int = real[i2]
+                t1_imag:int = imag[i2]
+                t2_real:int = real[i1]
+                t2_imag:int = imag[i1]
+                t3_real:int = real[i3]
+                t3_imag:int = imag[i3]
+                if j != 0:
+                    x:int = t1_real
+                    t1_real = (w1_real*x - w1_imag*t1_imag + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                    t1_imag = (w1_imag*x + w1_real*t1_imag + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                    x = t2_real
+                    t2_real = (w2_real*x - w2_imag*t2_imag + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                    t2_imag = (w2_imag*x + w2_real*t2_imag + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                    x = t3_real
+                    t3_real = (w3_real*x - w3_imag*t3_imag + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                    t3_imag = (w3_imag*x + w3_real*t3_imag + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+                u0_real:int = t0_real + t2_real
+                u0_imag:int = t0_imag + t2_imag
+                u1_real:int = t0_real - t2_real
+                u1_imag:int = t0_imag - t2_imag
+                u2_real:int = t1_real + t3_real
+                u2_imag:int = t1_imag + t3_imag
+                u3_real:int = t1_real - t3_real
+                u3_imag:int = t1_imag - t3_imag
+                # Divide by 4 with rounding, as two radix-2 stages would
+                real[i] = (u0_real + u2_real + 2)>>2
+                imag[i] = (u0_imag + u2_imag + 2)>>2
+                real[i2] = (u0_real - u2_real + 2)>>2
+                imag[i2] = (u0_imag - u2_imag + 2)>>2
+                # u1 - i*u3 and u1 + i*u3
+                real[i+out1] = (u1_real + u3_imag + 2)>>2
+                imag[i+out1] = (u1_imag - u3_real + 2)>>2
+                real[i+out3] = (u1_real - u3_imag + 2)>>2
+                imag[i+out3] = (u1_imag + u3_real + 2)>>2
+                i = i + step
+            j = j + 1
+        quarter = step
+
+# FFT of real[0:n], imag[0:n] with the radix-4 kernel, same arguments
+# as _fft_inplace, see fft_radix4_benchmark.py
+def _fft_inplace_radix4( real, imag, n, cos_table, table_size, inverse ):
+    _fft_batch_radix4( real, imag, n, n, cos_table, table_size, inverse )
+
+# FFTPlan and FFTBatch use _fft_batch_radix4 if radix4 is True,
+# _fft_inplace otherwise. Run fft_radix4_benchmark.py to compare both on a specific board.
+# The radix-4 kernel accepts values from -65536 to 65535 only, see RADIX4_LIMIT.
+radix4 = True
+
+# Block floating point
+# The bfp functions keep the values between BFP_LIMIT/2 and about
+# 2.8*BFP_LIMIT, shifting only when needed, and return an exponent.
+# The result times 2**exponent is then X, the unscaled DFT
+# sum(x[j]*e**(-2i*pi*j*k/n)). The input can use the full 32 bits.
+# (For comparison, fft() returns X/n)
+BFP_LIMIT = const(16384)
+BFP_LIMIT_HALF = const(8192) # must be BFP_LIMIT//2
+
+# Largest absolute value of real[0:n] and imag[0:n]
+@micropython.viper
+def _peak( real:ptr32, imag:ptr32, n:int )->int:
+    peak:int = 0
+    i:int = 0
+    while i < n:
+        x:int = real[i]
+        if x < 0:
+            x = 0 - x
+        if x > peak:
+            peak = x
+        x = imag[i]
+        if x < 0:
+            x = 0 - x
+        if x > peak:
+            peak = x
+        i = i + 1
+    return peak
+
+# Shift real[0:n] and imag[0:n] so that the peak is between BFP_LIMIT_HALF
+# and BFP_LIMIT-1. Returns the number of bits shifted right, negative
+# if shifted left.
+@micropython.viper
+def _bfp_normalize( real:ptr32, imag:ptr32, n:int )->int:
+    peak:int = int(_peak( real, imag, n ))
+    if peak == 0:
+        return 0
+    shift:int = 0
+    while peak >= BFP_LIMIT:
+        peak = peak>>1
+        shift = shift + 1
+    while peak < BFP_LIMIT_HALF:
+        peak = peak<<1
+        shift = shift - 1
+    i:int = 0
+    if shift > 0:
+        # Round, without overflow for values near 2**31
+        shift1:int = shift - 1
+        while i < n:
+            real[i] = ((real[i]>>shift1) + 1)>>1
+            imag[i] = ((imag[i]>>shift1) + 1)>>1
+            i = i + 1
+    elif shift < 0:
+        left:int = 0 - shift
+        while i < n:
+            real[i] = real[i]<<left
+            imag[i] = imag[i]<<left
+            i = i + 1
+    return shift
+
+# Same as _fft_inplace, but a stage only halves the values when the peak
+# of its input is BFP_LIMIT or more. Returns the number of stages that
+# halved the values. With inverse=1 computes the inverse FFT, see
+# _fft_inplace. The input peak must be less than BFP_LIMIT,
+# see _bfp_normalize. Values then never reach 65536, so the products
+# with the twiddle factors cannot overflow.
+@micropython.viper
+def _fft_inplace_bfp( real:ptr32, imag:ptr32, n:int, cos_table:ptr16, table_size:int, inverse:int )->int:
+    table_half:int = table_size>>1
+    table_quarter:int = table_size>>2
+    halvings:int = 0
+    peak:int = 0
+    half:int = 1
+    while half < n:
+        # shift=1 halves all values of this stage, shift=0 does not
+        shift:int = 0
+        if peak >= BFP_LIMIT:
+            shift = 1
+            halvings = halvings + 1
+        t_shift:int = COS_TABLE_SHIFT - 1 + shift
+        t_rounding:int = 1<<(t_shift-1)
+        peak = 0
+        step:int = half*2
+        multiple:int = table_size//step
+        j:int = 0
+        while j < half:
+            k:int = j*multiple
+            expo_real:int = 0
+            expo_imag:int = 0
+            if k <= table_quarter:
+                expo_real = int(cos_table[k])
+                expo_imag = 0 - int(cos_table[table_quarter-k])
+            else:
+                expo_real = 0 - int(cos_table[table_half-k])
+                expo_imag = 0 - int(cos_table[k-table_quarter])
+            if inverse:
+                expo_imag = 0-expo_imag
+            i:int = j
+            while i < n:
+                i2:int = i + half
+                t_real:int = ((expo_real*real[i2]>>1) - (expo_imag*imag[i2]>>1) + t_rounding)>>t_shift
+                t_imag:int = ((expo_imag*real[i2]>>1) + (expo_real*imag[i2]>>1) + t_rounding)>>t_shift
+                u_real:int = real[i]>>shift
+                u_imag:int = imag[i]>>shift
+                # Keep track of the peak for the next stage
+                x:int = u_real + t_real
+                real[i] = x
+                if x < 0:
+                    x = 0 - x
+                if x > peak:
+                    peak = x
+                x = u_imag + t_imag
+                imag[i] = x
+                if x < 0:
+                    x = 0 - x
+                if x > peak:
+                    peak = x
+                x = u_real - t_real
+                real[i2] = x
+                if x < 0:
+                    x = 0 - x
+                if x > peak:
+                    peak = x
+                x = u_imag - t_imag
+                imag[i2] = x
+                if x < 0:
+                    x = 0 - x
+                if x > peak:
+                    peak = x
+                i = i + step
+            j = j + 1
+        half = step
+    return halvings
+
 @micropython.viper
 def array_zero( data:ptr32, n:int):
     i:int = 0
@@ -106,8 +494,172 @@ def apply_window( signal:ptr32, window:ptr32, n:int):
     while i < n:
         # The window is scaled up.
         # Round and scale down
-        signal[i] = (int(signal[i]) * window[i] + COS_TABLE_FACTOR_HALF)//COS_TABLE_FACTOR
+        signal[i] = (int(signal[i]) * window[i] + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
         i = i + 1
+
+# 16 and 8 bit samples
+# array.array("h"), array.array("H"), bytearray, etc. can be used
+# directly as input, without widening them first to a 32 bit copy.
+# The narrow samples are read with ptr16 or ptr8 and sign extended
+# with (x ^ sign) - sign, sign is SIGN16 or SIGN8 for signed samples
+# and 0 for unsigned samples.
+SIGN16 = const(0x8000)
+SIGN8 = const(0x80)
+
+@micropython.viper
+def array_copy32( data_from:ptr32, data_to:ptr32, n:int):
+    i:int = 0
+    while i < n:
+        data_to[i] = data_from[i]
+        i = i + 1
+
+@micropython.viper
+def array_copy16( data_from:ptr16, data_to:ptr32, n:int, sign:int):
+    i:int = 0
+    while i < n:
+        data_to[i] = (int(data_from[i]) ^ sign) - sign
+        i = i + 1
+
+@micropython.viper
+def array_copy8( data_from:ptr8, data_to:ptr32, n:int, sign:int):
+    i:int = 0
+    while i < n:
+        data_to[i] = (int(data_from[i]) ^ sign) - sign
+        i = i + 1
+
+# Arrays with a known typecode, see sample_typecode.
+# 0 keeps no arrays, every call detects the typecode again.
+TYPECODE_CACHE_SIZE = 4
+# (data, typecode) of the last arrays, most recent last
+_typecodes = []
+
+# Get the array typecode to select the kernel for data.
+# Returns "i" for 32 bit integer arrays (signed or unsigned, the bits are
+# copied as they are), "h", "H", "b" or "B" for 16 and 8 bit arrays,
+# "B" for bytes and bytearray, and None for lists, float arrays and
+# other objects, these are read with the generic array_copy.
+# MicroPython arrays have no typecode attribute, but the repr of an
+# empty array is "array('h')". A memoryview has no typecode at all,
+# only 32 bit integer memoryviews are read directly, since 16 and 8 bit
+# values could be signed or unsigned.
+# The typecode of the last TYPECODE_CACHE_SIZE arrays and memoryviews
+# is kept, so that processing frames in the same buffers allocates
+# nothing after the first frame. Detecting the typecode of a new
+# array allocates a few bytes.
+# The cache holds a reference to these arrays: an array that is no
+# longer used is not freed until TYPECODE_CACHE_SIZE other arrays have
+# been seen, or until clear_typecodes() is called.
+def sample_typecode( data ):
+    for entry in _typecodes:
+        if entry[0] is data:
+            return entry[1]
+    typecode = _detect_typecode( data )
+    if isinstance( data, (array.array, memoryview) ):
+        _typecodes.append( (data, typecode) )
+        if len(_typecodes) > TYPECODE_CACHE_SIZE:
+            _typecodes.pop( 0 )
+    return typecode
+
+# Forget the arrays kept by sample_typecode, so that they can be freed
+def clear_typecodes():
+    _typecodes.clear()
+
+def _detect_typecode( data ):
+    if isinstance( data, (bytes, bytearray) ):
+        return "B"
+    if isinstance( data, array.array ):
+        typecode = repr( data[0:0] )[7]
+        if typecode in ("h", "H", "b", "B"):
+            return typecode
+        if typecode in ("i", "I"):
+            return "i"
+        if typecode in ("l", "L") and len(data) > 0 and len(bytes(data[0:1])) == 4:
+            # "l" is 64 bit on some ports
+            return "i"
+        return None
+    if isinstance( data, memoryview ) and len(data) > 0:
+        if len(bytes(data[0:1])) == 4 and not isinstance( data[0], float ):
+            return "i"
+    return None
+
+# Sign for the typecode, see SIGN16
+def _sign( typecode ):
+    if typecode == "h":
+        return SIGN16
+    if typecode == "b":
+        return SIGN8
+    return 0
+
+# Copy n samples of data to data_to, an array.array("i"),
+# with the fastest kernel for the typecode of data.
+# data: list or array of integers, bytes, bytearray or memoryview.
+# typecode: the array typecode of data, if None it is taken from
+# sample_typecode(data).
+def array_copy_typed( data, data_to, n, typecode=None ):
+    if typecode is None:
+        typecode = sample_typecode( data )
+    if typecode in ("i", "I", "l", "L"):
+        array_copy32( data, data_to, n )
+    elif typecode in ("h", "H"):
+        array_copy16( data, data_to, n, _sign( typecode ) )
+    elif typecode in ("b", "B"):
+        array_copy8( data, data_to, n, _sign( typecode ) )
+    else:
+        array_copy( data, data_to, n )
+
+# Same as apply_window, for a signal that holds every step-th
+# sample of the original signal, starting at sample start.
+@micropython.viper
+def _apply_window_step( signal:ptr32, window:ptr32, n:int, start:int, step:int ):
+    i:int = 0
+    k:int = start
+    while i < n:
+        signal[i] = (signal[i] * window[k] + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+        i = i + 1
+        k = k + step
+
+# Window functions, as coefficients of cos(2*pi*i*k/n), k=0,1,2...
+# These are periodic windows, as used for spectral analysis.
+WINDOWS = {
+    "hann": (0.5, -0.5),
+    "hamming": (0.54, -0.46),
+    "blackman": (0.42, -0.5, 0.08),
+    "flattop": (0.21557895, -0.41663158, 0.277263158, -0.083578947, 0.006947368),
+}
+
+_windows = {}
+
+# The quarter_wave_table of the cached plan of size n, if there is one
+def _quarter_wave_table( n ):
+    for plan in _plans:
+        if plan.n == n:
+            return plan.cos_table
+    return quarter_wave_table( n )
+
+# Get a window for apply_window, scaled up by COS_TABLE_FACTOR.
+# kind: "hann", "hamming", "blackman" or "flattop"
+# The window tables are computed once and cached until
+# clear_window_cache() is called. _windows is a dict of dicts,
+# _windows[kind][n], so that getting a cached window allocates nothing.
+def get_window( kind, n ):
+    windows = _windows.get( kind )
+    if windows is None:
+        windows = {}
+        _windows[kind] = windows
+    window = windows.get( n )
+    if window is None:
+        coefficients = WINDOWS[kind]
+        if n & 3:
+            window = array.array("i", (round(COS_TABLE_FACTOR*sum(c*cos(2*pi*i*k/n) for k, c in enumerate(coefficients))) for i in range(n)))
+        else:
+            # Use the quarter wave table of the FFT
+            table = _quarter_wave_table( n )
+            window = array.array("i", (round(sum(c*table_cos(table, n, i*k) for k, c in enumerate(coefficients))) for i in range(n)))
+        windows[n] = window
+    return window
+
+def clear_window_cache():
+    _windows.clear()
         
 @micropython.viper
 def apply_hann_windowing( signal:ptr32, n:int, cos_table:ptr16 ):
@@ -125,35 +677,757 @@ def apply_hann_windowing( signal:ptr32, n:int, cos_table:ptr16 ):
         signal[i] = (((signal[i]*sinval+COS_TABLE_FACTOR_HALF)//COS_TABLE_FACTOR)*sinval+COS_TABLE_FACTOR_HALF)//COS_TABLE_FACTOR
         i = i + 1
 
-    
-# Allocate fft buffers
-buf_imag = array.array("i", (0 for _ in range(BUFFER_SIZE)) )
-buf_real = array.array("i", buf_imag )
-out_real = array.array("i", buf_imag )
-out_imag = array.array("i", buf_imag )
 
-    
-# data: can be list or array, integer or float
-def fft(data, hann_windowing=False):
-    
-    n = len(data)
-    if n>BUFFER_SIZE:
+# Pack a real signal of 2*half samples as half complex values:
+# even samples go to real, odd samples go to imag
+@micropython.viper
+def _rfft_pack( data, real:ptr32, imag:ptr32, half:int ):
+    i:int = 0
+    while i < half:
+        real[i] = int(data[2*i])
+        imag[i] = int(data[2*i+1])
+        i = i + 1
+
+# Same as _rfft_pack, for 32, 16 and 8 bit arrays
+@micropython.viper
+def _rfft_pack32( data:ptr32, real:ptr32, imag:ptr32, half:int ):
+    i:int = 0
+    while i < half:
+        real[i] = data[2*i]
+        imag[i] = data[2*i+1]
+        i = i + 1
+
+@micropython.viper
+def _rfft_pack16( data:ptr16, real:ptr32, imag:ptr32, half:int, sign:int ):
+    i:int = 0
+    while i < half:
+        real[i] = (int(data[2*i]) ^ sign) - sign
+        imag[i] = (int(data[2*i+1]) ^ sign) - sign
+        i = i + 1
+
+@micropython.viper
+def _rfft_pack8( data:ptr8, real:ptr32, imag:ptr32, half:int, sign:int ):
+    i:int = 0
+    while i < half:
+        real[i] = (int(data[2*i]) ^ sign) - sign
+        imag[i] = (int(data[2*i+1]) ^ sign) - sign
+        i = i + 1
+
+# Pack with the fastest kernel for the typecode, see array_copy_typed
+def _rfft_pack_typed( data, real, imag, half, typecode ):
+    if typecode is None:
+        typecode = sample_typecode( data )
+    if typecode in ("i", "I", "l", "L"):
+        _rfft_pack32( data, real, imag, half )
+    elif typecode in ("h", "H"):
+        _rfft_pack16( data, real, imag, half, _sign( typecode ) )
+    elif typecode in ("b", "B"):
+        _rfft_pack8( data, real, imag, half, _sign( typecode ) )
+    else:
+        _rfft_pack( data, real, imag, half )
+
+# Convert the half size complex FFT of the packed signal to
+# bins 0..half of the FFT of the original real signal, in place.
+# Z[k] = E[k] + i*O[k], where E and O are the FFTs of even and odd samples:
+#   E[k] = (Z[k] + conj(Z[half-k]))/2
+#   O[k] = (Z[k] - conj(Z[half-k]))/(2i)
+#   X[k] = (E[k] + e**(-i*pi*k/half)*O[k])/2
+# The final /2 keeps the result scaled as fft(), i.e. down by n=2*half.
+# cos_table is a quarter_wave_table( table_size ), table_size a multiple of 2*half.
+@micropython.viper
+def _rfft_untangle( real:ptr32, imag:ptr32, half:int, cos_table:ptr16, table_size:int ):
+    # Bins 0 and half only depend on Z[0]
+    z_real:int = real[0]
+    z_imag:int = imag[0]
+    real[0] = (z_real + z_imag)>>1
+    imag[0] = 0
+    real[half] = (z_real - z_imag)>>1
+    imag[half] = 0
+    table_half:int = table_size>>1
+    table_quarter:int = table_size>>2
+    multiple:int = table_size//(half*2)
+    k:int = 1
+    while k <= half - k:
+        m:int = half - k
+        a:int = real[k]
+        b:int = imag[k]
+        c:int = real[m]
+        d:int = imag[m]
+        # e**(-i*pi*k/half), same table lookup as in _fft_inplace
+        t:int = k*multiple
+        expo_real:int = 0
+        expo_imag:int = 0
+        if t <= table_quarter:
+            expo_real = int(cos_table[t])
+            expo_imag = 0 - int(cos_table[table_quarter-t])
+        else:
+            expo_real = 0 - int(cos_table[table_half-t])
+            expo_imag = 0 - int(cos_table[t-table_quarter])
+        # 2*E[k] and 2*O[k]
+        e_real:int = a + c
+        e_imag:int = b - d
+        o_real:int = b + d
+        o_imag:int = c - a
+        # e**(-i*pi*k/half)*O[k]
+        t_real:int = ((expo_real*o_real>>1) - (expo_imag*o_imag>>1) + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+        t_imag:int = ((expo_imag*o_real>>1) + (expo_real*o_imag>>1) + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+        real[k] = ((e_real>>1) + t_real)>>1
+        imag[k] = ((e_imag>>1) + t_imag)>>1
+        # Bin half-k: E[half-k] = conj(E[k]), O[half-k] = conj(O[k])
+        # and e**(-i*pi*(half-k)/half) = -conj(e**(-i*pi*k/half))
+        # so the product is -conj(e**(-i*pi*k/half)*O[k])
+        real[m] = ((e_real>>1) - t_real)>>1
+        imag[m] = (t_imag - (e_imag>>1))>>1
+        k = k + 1
+
+
+# Returns 1 if a value of data[0:n] is not between -limit and limit-1
+@micropython.viper
+def _out_of_range( data:ptr32, n:int, limit:int )->int:
+    low:int = 0 - limit
+    i:int = 0
+    while i < n:
+        x:int = data[i]
+        if x >= limit or x < low:
+            return 1
+        i = i + 1
+    return 0
+
+# Windowed input must fit in 16 bits.
+# max() and min() would allocate an iterator
+def _check_range( data, n ):
+    if _out_of_range( data, n, 32768 ):
+        print(__name__, "error: fft values out of range")
         raise ValueError
-    print(__name__, "fft", n)
-    # If data is an array.array of "i" then
-    # the input array could be used as buf_real instead of allocating one.
-    array_copy( data, buf_real, n )
-    if hann_windowing:
-        apply_hann_windowing( buf_real, n, cos_table )
-        if max(buf_real)>32767 or  min(buf_real)<-32768:
-            #print(f"fftint {max(buf_real)=} {min(buf_real)=}")
-            print(__name__, "error: fft values out of range")
+
+# Input limit of the radix-4 kernel, also when not windowed.
+# The radix-2 kernel halves each product before adding them, the
+# radix-4 kernel adds the full products w_real*x - w_imag*y, 2**14 times
+# the complex magnitude of the value. That must fit in 31 bits, so the
+# magnitude must be less than 2**17, and real and imag must be between
+# -RADIX4_LIMIT and RADIX4_LIMIT-1, one bit less than for radix-2.
+RADIX4_LIMIT = const(65536)
+
+def _check_radix4( data, n ):
+    if _out_of_range( data, n, RADIX4_LIMIT ):
+        print(__name__, "error: fft values out of range for the radix-4 kernel")
+        raise ValueError
+
+# Load channels for a batch FFT: copy channel c of data to
+# real[c*n:(c+1)*n] in bit reversed order, optionally multiplying by the
+# window, and zero imag. Sample j of channel c is data[c*channel_step+j*stride],
+# so interleaved data has stride=channels, channel_step=1 and planar
+# data has stride=1, channel_step=n.
+# windowed=0 skips the window (window can be any array then).
+@micropython.viper
+def _batch_load32( data:ptr32, n:int, channels:int, stride:int, channel_step:int, bit_reverse:ptr16, window:ptr32, windowed:int, real:ptr32, imag:ptr32 ):
+    c:int = 0
+    while c < channels:
+        base:int = c*n
+        source:int = c*channel_step
+        j:int = 0
+        while j < n:
+            x:int = data[source]
+            if windowed:
+                x = (x*window[j] + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+            k:int = base + int(bit_reverse[j])
+            real[k] = x
+            imag[k] = 0
+            source = source + stride
+            j = j + 1
+        c = c + 1
+
+# Same as _batch_load32 for 16 bit samples, sign is SIGN16 for
+# signed samples and 0 for unsigned samples.
+@micropython.viper
+def _batch_load16( data:ptr16, n:int, channels:int, stride:int, channel_step:int, bit_reverse:ptr16, window:ptr32, windowed:int, real:ptr32, imag:ptr32, sign:int ):
+    c:int = 0
+    while c < channels:
+        base:int = c*n
+        source:int = c*channel_step
+        j:int = 0
+        while j < n:
+            x:int = (int(data[source]) ^ sign) - sign
+            if windowed:
+                x = (x*window[j] + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+            k:int = base + int(bit_reverse[j])
+            real[k] = x
+            imag[k] = 0
+            source = source + stride
+            j = j + 1
+        c = c + 1
+
+# Same as _batch_load16 for 8 bit samples, sign is SIGN8 or 0
+@micropython.viper
+def _batch_load8( data:ptr8, n:int, channels:int, stride:int, channel_step:int, bit_reverse:ptr16, window:ptr32, windowed:int, real:ptr32, imag:ptr32, sign:int ):
+    c:int = 0
+    while c < channels:
+        base:int = c*n
+        source:int = c*channel_step
+        j:int = 0
+        while j < n:
+            x:int = (int(data[source]) ^ sign) - sign
+            if windowed:
+                x = (x*window[j] + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+            k:int = base + int(bit_reverse[j])
+            real[k] = x
+            imag[k] = 0
+            source = source + stride
+            j = j + 1
+        c = c + 1
+
+# Same as _batch_load32 for lists, float arrays and other
+# objects, see array_copy
+@micropython.viper
+def _batch_load( data, n:int, channels:int, stride:int, channel_step:int, bit_reverse:ptr16, window:ptr32, windowed:int, real:ptr32, imag:ptr32 ):
+    c:int = 0
+    while c < channels:
+        base:int = c*n
+        source:int = c*channel_step
+        j:int = 0
+        while j < n:
+            x:int = int(data[source])
+            if windowed:
+                x = (x*window[j] + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+            k:int = base + int(bit_reverse[j])
+            real[k] = x
+            imag[k] = 0
+            source = source + stride
+            j = j + 1
+        c = c + 1
+
+# (real, imag) memoryviews of bins 0 to n//2, the result of rfft()
+def _half_views( real, imag, n ):
+    return ( memoryview(real)[0:n//2+1], memoryview(imag)[0:n//2+1] )
+
+# A FFTPlan has everything needed for a FFT of size n:
+# the twiddle table, the bit reversal table and the buffers.
+# Use get_plan(n) to get a cached plan.
+class FFTPlan:
+    def __init__( self, n ):
+        self.n = n
+        # Raises ValueError if n is not a power of two
+        self.bit_reverse = bit_reverse_table( n )
+        self.cos_table = quarter_wave_table( n )
+        self.real = array.array("i", (0 for _ in range(n)))
+        self.imag = array.array("i", self.real)
+        # Returned by fft(), a new tuple would be allocated
+        # on each call
+        self._result = (self.real, self.imag)
+        # Returned by rfft(), bins 0 to n//2 of the buffers
+        self._rfft_result = _half_views( self.real, self.imag, n )
+        # Free FFTBuffers, see buffers()
+        self._pool = []
+        # FFTBatch objects by number of channels, see batch()
+        self._batches = {}
+
+    # All FFT functions accept hann_windowing=True for a Hann window,
+    # or window=get_window(kind, n) for other windows.
+    def _window( self, hann_windowing, window ):
+        if window is not None:
+            if len(window) < self.n:
+                raise ValueError
+            return window
+        if hann_windowing:
+            return get_window( "hann", self.n )
+        return None
+
+    # In place FFT of real[0:size], imag[0:size] in bit reversed order,
+    # size is n or a smaller power of two. Uses the radix-4 or
+    # the radix-2 kernel, see radix4.
+    # Raises ValueError if the input is out of range for the radix-4 kernel,
+    # see RADIX4_LIMIT.
+    def _kernel( self, real, imag, size, inverse ):
+        if radix4:
+            _check_radix4( real, size )
+            _check_radix4( imag, size )
+            _fft_batch_radix4( real, imag, size, size, self.cos_table, self.n, inverse )
+        else:
+            _fft_inplace( real, imag, size, self.cos_table, self.n, inverse )
+
+    # data: can be list or array of integers, len(data) == n.
+    # 8, 16 and 32 bit arrays are read directly, see array_copy_typed.
+    # Returns (real, imag) plan buffers with the result, these are
+    # overwritten by the next call for this plan. Use buffers()
+    # to get buffers that are not shared.
+    def fft( self, data, hann_windowing=False, window=None, typecode=None ):
+        return self._fft( data, self._result, self._window( hann_windowing, window ), typecode )
+
+    # result: (real, imag) buffers for the result, returned
+    def _fft( self, data, result, window, typecode ):
+        real, imag = result
+        n = self.n
+        if len(data) != n:
+            raise ValueError
+        array_copy_typed( data, real, n, typecode )
+        if window is not None:
+            apply_window( real, window, n )
+            _check_range( real, n )
+        array_zero( imag, n )
+        _bit_reverse( real, imag, n, self.bit_reverse, 0 )
+        self._kernel( real, imag, n, 0 )
+        return result
+
+    # Block floating point FFT, see BFP_LIMIT.
+    # data: list or array of integers, any 32 bit value is accepted.
+    # Returns (real, imag, exponent), the FFT is real/imag*2**exponent.
+    # The values in real and imag have at most 16 bits.
+    def fft_bfp( self, data, hann_windowing=False, window=None, typecode=None ):
+        return self._fft_bfp( data, self.real, self.imag, self._window( hann_windowing, window ), typecode )
+
+    def _fft_bfp( self, data, real, imag, window, typecode ):
+        n = self.n
+        if len(data) != n:
+            raise ValueError
+        array_copy_typed( data, real, n, typecode )
+        array_zero( imag, n )
+        return real, imag, self._transform_bfp( real, imag, window, 0 )
+
+    def _transform_bfp( self, real, imag, window, inverse ):
+        n = self.n
+        exponent = _bfp_normalize( real, imag, n )
+        if window is not None:
+            apply_window( real, window, n )
+            apply_window( imag, window, n )
+            # Get back the precision lost by windowing
+            exponent += _bfp_normalize( real, imag, n )
+        _bit_reverse( real, imag, n, self.bit_reverse, 0 )
+        return exponent + _fft_inplace_bfp( real, imag, n, self.cos_table, n, inverse )
+
+    # Zero copy FFT of caller owned buffers.
+    # real, imag: array.array("i") or memoryview of one, with at least
+    # n elements. The first n elements are transformed in place, the result
+    # is left in real and imag. No data is copied and no memory is allocated.
+    def fft_inplace( self, real, imag, hann_windowing=False, window=None ):
+        n = self.n
+        if len(real) < n or len(imag) < n:
+            raise ValueError
+        window = self._window( hann_windowing, window )
+        if window is not None:
+            apply_window( real, window, n )
+            apply_window( imag, window, n )
+            _check_range( real, n )
+            _check_range( imag, n )
+        _bit_reverse( real, imag, n, self.bit_reverse, 0 )
+        self._kernel( real, imag, n, 0 )
+
+    # Same as fft_inplace, but with block floating point, see fft_bfp.
+    # Returns the exponent.
+    def fft_inplace_bfp( self, real, imag, hann_windowing=False, window=None ):
+        if len(real) < self.n or len(imag) < self.n:
+            raise ValueError
+        return self._transform_bfp( real, imag, self._window( hann_windowing, window ), 0 )
+
+    # Inverse FFT of caller owned buffers, in place, no copies.
+    # The result is (1/n)*sum(X[k]*e**(2i*pi*j*k/n)), so
+    # ifft_inplace of the result of fft_inplace gives the original data/n.
+    def ifft_inplace( self, real, imag ):
+        n = self.n
+        if len(real) < n or len(imag) < n:
+            raise ValueError
+        _bit_reverse( real, imag, n, self.bit_reverse, 0 )
+        self._kernel( real, imag, n, 1 )
+
+    # Block floating point inverse FFT, in place.
+    # Returns the exponent, real/imag*2**exponent is
+    # sum(X[k]*e**(2i*pi*j*k/n)), i.e. n times the inverse FFT.
+    def ifft_inplace_bfp( self, real, imag ):
+        if len(real) < self.n or len(imag) < self.n:
+            raise ValueError
+        return self._transform_bfp( real, imag, None, 1 )
+
+    # Inverse FFT, copies real and imag to the buffers of the plan,
+    # and returns those, see ifft_inplace.
+    def ifft( self, real, imag ):
+        n = self.n
+        if len(real) != n or len(imag) != n:
+            raise ValueError
+        array_copy( real, self.real, n )
+        array_copy( imag, self.imag, n )
+        self.ifft_inplace( self.real, self.imag )
+        return self._result
+
+    # FFT of a real signal, such as an ADC stream.
+    # Computes a n//2 point complex FFT of the packed even and odd samples,
+    # so it needs about half the CPU time of fft() and uses only
+    # n//2+1 entries of each buffer.
+    # Returns (real, imag) memoryviews of the plan buffers with bins 0
+    # to n//2. The bins above n//2 are not computed, bin n-k is the
+    # complex conjugate of bin k. Scaling is the same as fft().
+    def rfft( self, data, hann_windowing=False, window=None, typecode=None ):
+        return self._rfft( data, self._rfft_result, self._window( hann_windowing, window ), typecode )
+
+    def _rfft( self, data, result, window, typecode ):
+        real, imag = result
+        n = self.n
+        if len(data) != n or n < 4:
+            raise ValueError
+        half = n//2
+        _rfft_pack_typed( data, real, imag, half, typecode )
+        if window is not None:
+            _apply_window_step( real, window, half, 0, 2 )
+            _apply_window_step( imag, window, half, 1, 2 )
+            _check_range( real, half )
+            _check_range( imag, half )
+        _bit_reverse( real, imag, half, self.bit_reverse, 1 )
+        self._kernel( real, imag, half, 0 )
+        _rfft_untangle( real, imag, half, self.cos_table, n )
+        return result
+
+    # Block floating point rfft, returns (real, imag, exponent),
+    # see fft_bfp and rfft
+    def rfft_bfp( self, data, hann_windowing=False, window=None, typecode=None ):
+        real, imag = self._rfft_result
+        return self._rfft_bfp( data, real, imag, self._window( hann_windowing, window ), typecode )
+
+    def _rfft_bfp( self, data, real, imag, window, typecode ):
+        n = self.n
+        if len(data) != n or n < 4:
+            raise ValueError
+        half = n//2
+        _rfft_pack_typed( data, real, imag, half, typecode )
+        exponent = _bfp_normalize( real, imag, half )
+        if window is not None:
+            _apply_window_step( real, window, half, 0, 2 )
+            _apply_window_step( imag, window, half, 1, 2 )
+            exponent += _bfp_normalize( real, imag, half )
+        _bit_reverse( real, imag, half, self.bit_reverse, 1 )
+        exponent += _fft_inplace_bfp( real, imag, half, self.cos_table, n, 0 )
+        # _rfft_untangle halves the values once more
+        _rfft_untangle( real, imag, half, self.cos_table, n )
+        return real, imag, exponent + 1
+
+    # Get a FFTBuffers object from the pool of this plan.
+    # The pool grows to the number of buffers in use at the same time,
+    # after that no more buffers are allocated.
+    def buffers( self ):
+        if self._pool:
+            return self._pool.pop()
+        return FFTBuffers( self )
+
+    # Return buffers to the pool
+    def release( self, buffers ):
+        self._pool.append( buffers )
+
+    # Get the FFTBatch of this plan for channels channels,
+    # the buffers are allocated on first use.
+    def batch( self, channels ):
+        b = self._batches.get( channels )
+        if b is None:
+            b = FFTBatch( self, channels )
+            self._batches[channels] = b
+        return b
+
+# Result buffers for a FFTPlan, to be used when the results of several
+# FFTs have to be kept at the same time, for example by asyncio tasks
+# that await between computing and using the FFT:
+#    with fft_int.get_plan(256).buffers() as b:
+#        real, imag = b.fft( data )
+#        await asyncio.sleep_ms(10)
+#        # real and imag are still the FFT of data
+# Leaving the with block returns the buffers to the pool of the plan.
+class FFTBuffers:
+    def __init__( self, plan ):
+        self.plan = plan
+        self.real = array.array("i", (0 for _ in range(plan.n)))
+        self.imag = array.array("i", self.real)
+        self._result = (self.real, self.imag)
+        self._rfft_result = _half_views( self.real, self.imag, plan.n )
+
+    def fft( self, data, hann_windowing=False, window=None, typecode=None ):
+        plan = self.plan
+        return plan._fft( data, self._result, plan._window( hann_windowing, window ), typecode )
+
+    def rfft( self, data, hann_windowing=False, window=None, typecode=None ):
+        plan = self.plan
+        return plan._rfft( data, self._rfft_result, plan._window( hann_windowing, window ), typecode )
+
+    def fft_bfp( self, data, hann_windowing=False, window=None, typecode=None ):
+        plan = self.plan
+        return plan._fft_bfp( data, self.real, self.imag, plan._window( hann_windowing, window ), typecode )
+
+    def rfft_bfp( self, data, hann_windowing=False, window=None, typecode=None ):
+        plan = self.plan
+        real, imag = self._rfft_result
+        return plan._rfft_bfp( data, real, imag, plan._window( hann_windowing, window ), typecode )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_val, exc_traceback ):
+        self.plan.release( self )
+
+# FFT of several channels sampled at the same time, for example a
+# sensor array. All channels are loaded in one pass and transformed
+# together, sharing the twiddle factors, with the overhead of a single call.
+# The result is planar: channel c is at real[c*n:(c+1)*n], imag[c*n:(c+1)*n],
+# see channel(). Use FFTPlan.batch( channels ) to get a FFTBatch.
+class FFTBatch:
+    def __init__( self, plan, channels ):
+        self.plan = plan
+        self.channels = channels
+        n = plan.n
+        self.real = array.array("i", (0 for _ in range(channels*n)))
+        self.imag = array.array("i", self.real)
+        self._result = (self.real, self.imag)
+        # Result of each channel, without copies
+        self._channels = [ (memoryview(self.real)[c*n:(c+1)*n], memoryview(self.imag)[c*n:(c+1)*n]) for c in range(channels) ]
+
+    # data: list or array with channels*n samples, the same types as
+    # for fft(), see array_copy_typed.
+    # interleaved=True: sample j of channel c is data[j*channels+c]
+    # interleaved=False: planar, sample j of channel c is data[c*n+j]
+    # Returns (real, imag) with the FFT of all channels, same scaling as fft().
+    def fft( self, data, interleaved=True, hann_windowing=False, window=None, typecode=None ):
+        plan = self.plan
+        n = plan.n
+        channels = self.channels
+        length = channels*n
+        if len(data) != length:
+            raise ValueError
+        window = plan._window( hann_windowing, window )
+        windowed = 1
+        if window is None:
+            window = self.real
+            windowed = 0
+        if interleaved:
+            stride = channels
+            channel_step = 1
+        else:
+            stride = 1
+            channel_step = n
+        real = self.real
+        imag = self.imag
+        if typecode is None:
+            typecode = sample_typecode( data )
+        if typecode in ("i", "I", "l", "L"):
+            _batch_load32( data, n, channels, stride, channel_step, plan.bit_reverse, window, windowed, real, imag )
+        elif typecode in ("h", "H"):
+            _batch_load16( data, n, channels, stride, channel_step, plan.bit_reverse, window, windowed, real, imag, _sign( typecode ) )
+        elif typecode in ("b", "B"):
+            _batch_load8( data, n, channels, stride, channel_step, plan.bit_reverse, window, windowed, real, imag, _sign( typecode ) )
+        else:
+            _batch_load( data, n, channels, stride, channel_step, plan.bit_reverse, window, windowed, real, imag )
+        if windowed:
+            _check_range( real, length )
+        if radix4:
+            # imag is zero
+            _check_radix4( real, length )
+            _fft_batch_radix4( real, imag, n, length, plan.cos_table, n, 0 )
+        else:
+            for channel_real, channel_imag in self._channels:
+                _fft_inplace( channel_real, channel_imag, n, plan.cos_table, n, 0 )
+        return self._result
+
+    # (real, imag) memoryviews with the result for channel c
+    def channel( self, c ):
+        return self._channels[c]
+
+# Plans are cached, most recently used last.
+# When more than plan_cache_size sizes are in use, the least
+# recently used plan is discarded.
+plan_cache_size = 4
+_plans = []
+
+def get_plan( n ):
+    for plan in _plans:
+        if plan.n == n:
+            if plan is not _plans[-1]:
+                _plans.remove( plan )
+                _plans.append( plan )
+            return plan
+    plan = FFTPlan( n )
+    _plans.append( plan )
+    while len(_plans) > plan_cache_size:
+        _plans.pop(0)
+    return plan
+
+    
+# data: can be list or array of integers, 8, 16 or 32 bit
+# len(data) must be a power of two.
+# Returns the buffers of the plan for len(data), these are
+# overwritten by the next fft() or rfft() of the same size.
+def fft(data, hann_windowing=False, window=None, typecode=None):
+    return get_plan( len(data) ).fft( data, hann_windowing, window, typecode )
+
+# FFT of a real signal, see FFTPlan.rfft
+def rfft(data, hann_windowing=False, window=None, typecode=None):
+    return get_plan( len(data) ).rfft( data, hann_windowing, window, typecode )
+
+# Block floating point FFT, returns (real, imag, exponent).
+# Accepts any 32 bit integer data, see FFTPlan.fft_bfp
+def fft_bfp(data, hann_windowing=False, window=None, typecode=None):
+    return get_plan( len(data) ).fft_bfp( data, hann_windowing, window, typecode )
+
+# Block floating point FFT of a real signal, see FFTPlan.rfft_bfp
+def rfft_bfp(data, hann_windowing=False, window=None, typecode=None):
+    return get_plan( len(data) ).rfft_bfp( data, hann_windowing, window, typecode )
+
+# Inverse FFT of len(real) points, see FFTPlan.ifft
+def ifft(real, imag):
+    return get_plan( len(real) ).ifft( real, imag )
+
+# Zero copy FFT of len(real) points, see FFTPlan.fft_inplace.
+# To transform part of a buffer, pass a memoryview slice:
+#   fft_inplace( memoryview(real)[0:256], memoryview(imag)[0:256] )
+def fft_inplace(real, imag, hann_windowing=False, window=None):
+    get_plan( len(real) ).fft_inplace( real, imag, hann_windowing, window )
+
+# Zero copy inverse FFT, see FFTPlan.ifft_inplace
+def ifft_inplace(real, imag):
+    get_plan( len(real) ).ifft_inplace( real, imag )
+
+# FFT of channels channels of n samples each, interleaved or planar,
+# returns the planar (real, imag) result, see FFTBatch.fft
+def fft_batch(data, channels, interleaved=True, hann_windowing=False, window=None, typecode=None):
+    return get_plan( len(data)//channels ).batch( channels ).fft( data, interleaved, hann_windowing, window, typecode )
+
+
+# Fast convolution with overlap-add.
+# Copy data[start:start+count] to block[0:count], fill the rest of
+# block[0:n] and imag[0:n] with zeros.
+@micropython.viper
+def _copy_block( data:ptr32, start:int, count:int, block:ptr32, imag:ptr32, n:int ):
+    source:ptr32 = ptr32(uint(data)+start*4)
+    i:int = 0
+    while i < count:
+        block[i] = source[i]
+        imag[i] = 0
+        i = i + 1
+    while i < n:
+        block[i] = 0
+        imag[i] = 0
+        i = i + 1
+
+# real, imag = (real, imag)*(h_real, h_imag)>>COS_TABLE_SHIFT
+# The peak of h_real, h_imag must be less than BFP_LIMIT, the complex
+# magnitude of real, imag less than 65536*sqrt(2), so no overflow occurs.
+@micropython.viper
+def _complex_multiply( real:ptr32, imag:ptr32, h_real:ptr32, h_imag:ptr32, n:int ):
+    i:int = 0
+    while i < n:
+        x:int = real[i]
+        y:int = imag[i]
+        hx:int = h_real[i]
+        hy:int = h_imag[i]
+        real[i] = (x*hx - y*hy + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+        imag[i] = (x*hy + y*hx + COS_TABLE_FACTOR_HALF)>>COS_TABLE_SHIFT
+        i = i + 1
+
+# Multiply block[0:count] by 2**shift, add the overlap from previous
+# blocks and store in out[start:start+count]. Then the overlap is moved
+# down by count and the rest of the block is added to it.
+@micropython.viper
+def _overlap_add( block:ptr32, count:int, shift:int, overlap:ptr32, overlap_length:int, out:ptr32, start:int ):
+    destination:ptr32 = ptr32(uint(out)+start*4)
+    right:int = 0
+    rounding:int = 0
+    if shift < 0:
+        right = 0 - shift
+        rounding = 1<<(right-1)
+    i:int = 0
+    total:int = count + overlap_length
+    while i < total:
+        if right:
+            block[i] = (block[i] + rounding)>>right
+        else:
+            block[i] = block[i]<<shift
+        i = i + 1
+    i = 0
+    while i < count:
+        if i < overlap_length:
+            destination[i] = block[i] + overlap[i]
+        else:
+            destination[i] = block[i]
+        i = i + 1
+    i = 0
+    while i < overlap_length:
+        if count + i < overlap_length:
+            overlap[i] = overlap[count+i] + block[count+i]
+        else:
+            overlap[i] = block[count+i]
+        i = i + 1
+
+# Streaming FIR filter with FFT convolution and overlap-add.
+# kernel: the filter coefficients (impulse response), list or array of
+# integers, any 32 bit value.
+# n: FFT size, a power of two, must be at least len(kernel). By default
+# the smallest power of two with n >= 2*len(kernel).
+# Each call to process() filters up to block_size = n-len(kernel)+1
+# samples. The output is the convolution sum(signal[i-j]*kernel[j]),
+# with about 14 bits of precision relative to its peak. No memory is
+# allocated after __init__.
+class FFTConvolver:
+    def __init__( self, kernel, n=0 ):
+        m = len(kernel)
+        if n == 0:
+            n = 4
+            while n < 2*m:
+                n *= 2
+        if m < 1 or n < m:
+            raise ValueError
+        self.plan = get_plan( n )
+        self.block_size = n - m + 1
+        self.log2n = 0
+        while (1<<self.log2n) < n:
+            self.log2n += 1
+        # FFT of the kernel, normalized for _complex_multiply
+        self.h_real = array.array("i", (0 for _ in range(n)))
+        self.h_imag = array.array("i", self.h_real)
+        array_copy( kernel, self.h_real, m )
+        self.h_exponent = self.plan.fft_inplace_bfp( self.h_real, self.h_imag )
+        self.h_exponent += _bfp_normalize( self.h_real, self.h_imag, n )
+        self.real = array.array("i", self.h_imag)
+        self.imag = array.array("i", self.h_imag)
+        self.overlap = array.array("i", (0 for _ in range(m-1)))
+
+    # Filter signal[start:start+count], count <= block_size.
+    # signal: array.array("i").
+    # The result is stored in out[out_start:out_start+count],
+    # out: array.array("i")
+    def process( self, signal, start, count, out, out_start ):
+        if count > self.block_size or start + count > len(signal) or out_start + count > len(out):
             raise ValueError
-    array_copy( buf_real, out_real, n )
-    array_zero( buf_imag, n )
-    array_zero( out_imag, n )
-    _fftint( buf_real, buf_imag, out_real, out_imag, n, 1, cos_table )
-    return buf_real, buf_imag
+        plan = self.plan
+        n = plan.n
+        real = self.real
+        imag = self.imag
+        _copy_block( signal, start, count, real, imag, n )
+        exponent = plan.fft_inplace_bfp( real, imag )
+        _complex_multiply( real, imag, self.h_real, self.h_imag, n )
+        exponent += plan.ifft_inplace_bfp( real, imag )
+        exponent += self.h_exponent + COS_TABLE_SHIFT - self.log2n
+        _overlap_add( real, count, exponent, self.overlap, len(self.overlap), out, out_start )
+
+    # Store the remaining len(kernel)-1 output samples in out[out_start:]
+    # and clear the overlap to start a new signal.
+    def flush( self, out, out_start ):
+        overlap = self.overlap
+        m1 = len(overlap)
+        if out_start + m1 > len(out):
+            raise ValueError
+        for i in range(m1):
+            out[out_start+i] = overlap[i]
+        array_zero( overlap, m1 )
+
+# Convolution of signal with kernel, i.e. FIR filter, using FFTConvolver.
+# signal: array.array("i"), kernel: list or array of integers.
+# out: array.array("i") of len(signal)+len(kernel)-1 elements for the
+# result, if not given, one is allocated.
+# Returns out.
+def fft_convolve( signal, kernel, out=None ):
+    convolver = FFTConvolver( kernel )
+    length = len(signal)
+    if out is None:
+        out = array.array("i", (0 for _ in range(length+len(kernel)-1)))
+    block_size = convolver.block_size
+    position = 0
+    while position < length:
+        count = min( block_size, length - position )
+        convolver.process( signal, position, count, out, position )
+        position += count
+    convolver.flush( out, position )
+    return out
 
 
 # return magnitude of fft of a segment of the frequency spectrum
@@ -161,3 +1435,88 @@ def fft_abs( data, from_position, to_position ):
     x, y = data
     return [ sqrt(x[i]**2+y[i]**2) for i in range(from_position, to_position) ]
 
+
+
+# Allocation free alternatives to fft_abs.
+# real, imag: result of a FFT, the bins from_position to to_position-1
+# are stored in out[0] to out[to_position-from_position-1].
+# out should be an array.array("I"). fft() returns X/n, so no bin is
+# larger than the largest input sample. The power and magnitude are
+# exact for input samples from -32768 to 32767, the power is then less
+# than 2**31. Input samples up to RADIX4_LIMIT without a window can give
+# bins close to 65536, the power of those overflows 32 bits.
+
+# Power spectrum, re*re+im*im
+@micropython.viper
+def fft_power( real:ptr32, imag:ptr32, from_position:int, to_position:int, out:ptr32 ):
+    i:int = from_position
+    k:int = 0
+    while i < to_position:
+        x:int = real[i]
+        y:int = imag[i]
+        out[k] = x*x + y*y
+        i = i + 1
+        k = k + 1
+
+# Magnitude spectrum, same as fft_abs but rounded down to an integer.
+# Uses a bit by bit integer square root.
+@micropython.viper
+def fft_magnitude( real:ptr32, imag:ptr32, from_position:int, to_position:int, out:ptr32 ):
+    i:int = from_position
+    k:int = 0
+    while i < to_position:
+        x:int = real[i]
+        y:int = imag[i]
+        p:uint = uint(x*x + y*y)
+        root:uint = uint(0)
+        bit:uint = uint(1)<<30
+        while bit > p:
+            bit = bit>>2
+        while bit != 0:
+            if p >= root + bit:
+                p = p - (root + bit)
+                root = (root>>1) + bit
+            else:
+                root = root>>1
+            bit = bit>>2
+        out[k] = root
+        i = i + 1
+        k = k + 1
+
+# Logarithm of the power spectrum.
+# log_table[i] = 256*log2(1+i/LOG_TABLE_SIZE), the mantissa of the
+# power is looked up with LOG_TABLE_BITS bits.
+LOG_TABLE_BITS = const(6)
+LOG_TABLE_SIZE = const(64) # must be 1<<LOG_TABLE_BITS
+log_table = array.array("H", (round(256*log(1+i/LOG_TABLE_SIZE)/log(2)) for i in range(LOG_TABLE_SIZE)))
+
+# Factors for power_to_log
+LOG2_Q8 = const(256) # result is 256*log2(power)
+DB_Q8 = const(771)   # result is 256*10*log10(power) = 256*dB
+
+# out[i] = factor*log2(power[i])
+# The result is 0 for power 0. The error is less than 0.03 for log2
+# or 0.1 for dB.
+# power: array.array("I"), for example from fft_power.
+# out: array.array("i") or "I"
+@micropython.viper
+def power_to_log( power:ptr32, n:int, out:ptr32, factor:int ):
+    i:int = 0
+    while i < n:
+        p:uint = uint(power[i])
+        result:int = 0
+        if p != 0:
+            # Position of the most significant bit
+            e:int = 0
+            x:uint = p
+            while x > 1:
+                x = x>>1
+                e = e + 1
+            # Next LOG_TABLE_BITS bits below the most significant bit
+            if e >= LOG_TABLE_BITS:
+                m:int = int(p>>(e-LOG_TABLE_BITS)) & (LOG_TABLE_SIZE-1)
+            else:
+                m = int(p<<(LOG_TABLE_BITS-e)) & (LOG_TABLE_SIZE-1)
+            result = ((e*256 + int(log_table[m]))*factor + 128)>>8
+        out[i] = result
+        i = i + 1
@@ -0,0 +1,48 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Example of profiler.py: time of each viper kernel of fft() and rfft()
+# with a Hann window, and of the _fftint recursive FFT, for n=256.
+# Run on the unix port or on the board with: micropython fft_profile.py
+import sys
+import array
+import random
+sys.path.append("..")
+import profiler
+import fft_int
+
+N = 256
+CALLS = 20
+
+# Replace the kernels in fft_int by profiled wrappers, with the
+# number of arguments of each kernel
+for name, nargs in ( ("array_copy32", 3), ("array_zero", 2), ("apply_window", 3),
+                     ("_apply_window_step", 5), ("_check_range", 2),
+                     ("_bit_reverse", 5), ("_fft_inplace", 6), ("_fft_batch_radix4", 7),
+                     ("_rfft_pack32", 4), ("_rfft_untangle", 5) ):
+    profiler.instrument( fft_int, name, nargs )
+
+data = array.array("i", (random.randint(-2047, 2047) for _ in range(N)))
+buf_real = array.array("i", (0 for _ in range(N)))
+buf_imag = array.array("i", buf_real)
+out_real = array.array("i", buf_real)
+out_imag = array.array("i", buf_real)
+
+plan = fft_int.get_plan( N )
+fft_region = profiler.region(f"fft n={N}")
+rfft_region = profiler.region(f"rfft n={N}")
+# _fftint is recursive, a region counts only the outermost call
+fftint_region = profiler.region(f"_fftint n={N}")
+for _ in range(CALLS):
+    with fft_region:
+        plan.fft( data, True )
+    with rfft_region:
+        plan.rfft( data, True )
+    fft_int.array_copy( data, buf_real, N )
+    fft_int.array_copy( data, out_real, N )
+    fft_int.array_zero( buf_imag, N )
+    fft_int.array_zero( out_imag, N )
+    with fftint_region:
+        fft_int._fftint( buf_real, buf_imag, out_real, out_imag, N, 1, fft_int.get_cos_table() )
+
+profiler.report()
@@ -0,0 +1,56 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Compare speed and accuracy of the radix-2 _fft_inplace with the
+# radix-4 _fft_inplace_radix4. The error is measured against
+# a floating point FFT, in units of the least significant bit.
+# Run on the unix port or on the board with: micropython fft_radix4_benchmark.py
+import sys
+import array
+import random
+import cmath
+from math import pi
+import fft_int
+sys.path.append("..")
+import benchmark
+
+REPEAT = 20
+
+# Floating point FFT, scaled down by n like fft_int
+def float_fft( x ):
+    n = len(x)
+    if n == 1:
+        return x
+    even = float_fft( x[0::2] )
+    odd = float_fft( x[1::2] )
+    result = [0]*n
+    for k in range(n//2):
+        t = cmath.exp( -2j*pi*k/n )*odd[k]
+        result[k] = (even[k] + t)/2
+        result[k+n//2] = (even[k] - t)/2
+    return result
+
+def run_kernel( kernel, data, real, imag, n, plan ):
+    fft_int.array_copy( data, real, n )
+    fft_int.array_zero( imag, n )
+    fft_int._bit_reverse( real, imag, n, plan.bit_reverse, 0 )
+    kernel( real, imag, n, plan.cos_table, n, 0 )
+
+def largest_error( real, imag, reference ):
+    return max( abs( complex( real[k], imag[k] ) - reference[k] ) for k in range(len(reference)) )
+
+for n in (64, 128, 256, 512, 1024):
+    print(f"FFT size {n}, {REPEAT} repetitions")
+    data = array.array("i", (random.randint(-16000, 16000) for _ in range(n)))
+    reference = float_fft( [ complex(x) for x in data ] )
+    real = array.array("i", (0 for _ in range(n)))
+    imag = array.array("i", real)
+    plan = fft_int.get_plan( n )
+
+    radix2 = benchmark.run(f"radix-2 _fft_inplace n={n}", run_kernel, fft_int._fft_inplace, data, real, imag, n, plan, repeat=REPEAT )
+    error2 = largest_error( real, imag, reference )
+
+    radix4 = benchmark.run(f"radix-4 _fft_inplace_radix4 n={n}", run_kernel, fft_int._fft_inplace_radix4, data, real, imag, n, plan, repeat=REPEAT )
+    error4 = largest_error( real, imag, reference )
+
+    print(f"\tradix-2/radix-4 time {benchmark.ratio(radix2, radix4):.2f}, largest error radix-2 {error2:.2f} radix-4 {error4:.2f}")
@@ -0,0 +1,306 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Fixed point time domain filters in viper code: a cascade of biquads
+# (IIR) and a FIR filter. Both keep their state between calls to
+# process(), so a stream can be filtered block by block, for example
+# as the blocks arrive from the ADC.
+#
+# The coefficients are integers, computed once at load time with
+# biquad_coefficients() and fir_lowpass()/fir_highpass():
+#    LOWPASS = filters.biquad_coefficients( "lowpass", 1000, 16000 )
+#    f = filters.Biquad( (LOWPASS, LOWPASS) )
+#    ...
+#    f.process( block, out )
+#
+# The input can be array.array("i"), or array.array("h"/"H") read directly,
+# see fft_int.array_copy_typed. The output is array.array("i").
+# There are no overflow checks, see Biquad and FIR for the range of
+# the samples.
+
+import array
+from math import cos, sin, pi, sqrt
+import fft_int
+
+# Biquad coefficients are Q14, i.e. scaled by 2**14, since a1 can be
+# up to 2. FIR coefficients are Q15.
+BIQUAD_SHIFT = const(14)
+BIQUAD_MASK = const(0x3fff) # (1<<BIQUAD_SHIFT)-1
+FIR_SHIFT = const(15)
+FIR_ROUNDING = const(0x4000) # 1<<(FIR_SHIFT-1)
+
+# Number of coefficients and of state values of a biquad section
+BIQUAD_COEFFICIENTS = const(5)
+BIQUAD_STATE = const(5)
+
+# Biquad cascade, direct form I, one sample at a time through all
+# sections. For each section, coefficients has b0, b1, b2, a1, a2
+# and state has x[-1], x[-2], y[-1], y[-2] and the remainder of the
+# last shift, which is added to the next sample (error feedback),
+# this keeps low frequency filters accurate with Q14 coefficients.
+# out can be the same array as data.
+@micropython.viper
+def _biquad32( data:ptr32, out:ptr32, n:int, coefficients:ptr32, sections:int, state:ptr32 ):
+    j:int = 0
+    while j < n:
+        x:int = data[j]
+        c:ptr32 = ptr32(coefficients)
+        s:ptr32 = ptr32(state)
+        section:int = 0
+        while section < sections:
+            acc:int = c[0]*x + c[1]*s[0] + c[2]*s[1] - c[3]*s[2] - c[4]*s[3] + s[4]
+            y:int = acc>>BIQUAD_SHIFT
+            s[4] = acc & BIQUAD_MASK
+            s[1] = s[0]
+            s[0] = x
+            s[3] = s[2]
+            s[2] = y
+            x = y
+            c = ptr32(uint(c)+BIQUAD_COEFFICIENTS*4)
+            s = ptr32(uint(s)+BIQUAD_STATE*4)
+            section += 1
+        out[j] = x
+        j += 1
+
+# Same as _biquad32 for 16 bit samples, sign is fft_int.SIGN16
+# for signed samples and 0 for unsigned samples.
+@micropython.viper
+def _biquad16( data:ptr16, out:ptr32, n:int, coefficients:ptr32, sections:int, state:ptr32, sign:int ):
+    j:int = 0
+    while j < n:
+        x:int = (int(data[j]) ^ sign) - sign
+        c:ptr32 = ptr32(coefficients)
+        s:ptr32 = ptr32(state)
+        section:int = 0
+        while section < sections:
+            acc:int = c[0]*x + c[1]*s[0] + c[2]*s[1] - c[3]*s[2] - c[4]*s[3] + s[4]
+            y:int = acc>>BIQUAD_SHIFT
+            s[4] = acc & BIQUAD_MASK
+            s[1] = s[0]
+            s[0] = x
+            s[3] = s[2]
+            s[2] = y
+            x = y
+            c = ptr32(uint(c)+BIQUAD_COEFFICIENTS*4)
+            s = ptr32(uint(s)+BIQUAD_STATE*4)
+            section += 1
+        out[j] = x
+        j += 1
+
+# Cascade of biquad sections.
+# sections: list or tuple of (b0, b1, b2, a1, a2) tuples, Q14,
+# for example from biquad_coefficients().
+# The samples, and the output of each section, should be between
+# -8192 and 8191 (14 bits) so that the sums of products can't overflow.
+class Biquad:
+    def __init__( self, sections ):
+        self.sections = len(sections)
+        self.coefficients = array.array("i", (c for section in sections for c in section))
+        if len(self.coefficients) != BIQUAD_COEFFICIENTS*self.sections:
+            raise ValueError
+        self.state = array.array("i", (0 for _ in range(BIQUAD_STATE*self.sections)))
+
+    # Filter data, store the result in out, array.array("i") with
+    # at least len(data) elements. out can be data if data is "i".
+    def process( self, data, out, typecode=None ):
+        n = len(data)
+        if len(out) < n:
+            raise ValueError
+        if typecode is None:
+            typecode = fft_int.sample_typecode( data )
+        if typecode in ("h", "H"):
+            _biquad16( data, out, n, self.coefficients, self.sections, self.state, fft_int._sign( typecode ) )
+        elif typecode == "i":
+            _biquad32( data, out, n, self.coefficients, self.sections, self.state )
+        else:
+            raise ValueError
+
+    # Clear the state to start a new signal
+    def reset( self ):
+        fft_int.array_zero( self.state, len(self.state) )
+
+# FIR filter, out[j] = sum(taps[k]*x[j-k]) for k < m, Q15 taps.
+# history has the previous m-1 samples, oldest first, so
+# x[j-k] for j-k < 0 is history[m-1+j-k].
+# out must not be the same array as data.
+@micropython.viper
+def _fir32( data:ptr32, out:ptr32, n:int, taps:ptr32, m:int, history:ptr32 ):
+    j:int = 0
+    while j < n:
+        acc:int = FIR_ROUNDING
+        # Taps for the samples of this block
+        k:int = 0
+        last:int = j
+        if last > m-1:
+            last = m-1
+        while k <= last:
+            acc += taps[k]*data[j-k]
+            k += 1
+        # Taps for the samples of previous blocks
+        h:int = m-1+j-k
+        while k < m:
+            acc += taps[k]*history[h]
+            h -= 1
+            k += 1
+        out[j] = acc>>FIR_SHIFT
+        j += 1
+
+@micropython.viper
+def _fir16( data:ptr16, out:ptr32, n:int, taps:ptr32, m:int, history:ptr32, sign:int ):
+    j:int = 0
+    while j < n:
+        acc:int = FIR_ROUNDING
+        k:int = 0
+        last:int = j
+        if last > m-1:
+            last = m-1
+        while k <= last:
+            acc += taps[k]*((int(data[j-k]) ^ sign) - sign)
+            k += 1
+        h:int = m-1+j-k
+        while k < m:
+            acc += taps[k]*history[h]
+            h -= 1
+            k += 1
+        out[j] = acc>>FIR_SHIFT
+        j += 1
+
+# Keep the last m-1 samples of history followed by data[0:n] in history
+@micropython.viper
+def _fir_history32( data:ptr32, n:int, history:ptr32, m1:int ):
+    i:int = 0
+    if n >= m1:
+        while i < m1:
+            history[i] = data[n-m1+i]
+            i += 1
+    else:
+        while i < m1-n:
+            history[i] = history[i+n]
+            i += 1
+        while i < m1:
+            history[i] = data[i-(m1-n)]
+            i += 1
+
+@micropython.viper
+def _fir_history16( data:ptr16, n:int, history:ptr32, m1:int, sign:int ):
+    i:int = 0
+    if n >= m1:
+        while i < m1:
+            history[i] = (int(data[n-m1+i]) ^ sign) - sign
+            i += 1
+    else:
+        while i < m1-n:
+            history[i] = history[i+n]
+            i += 1
+        while i < m1:
+            history[i] = (int(data[i-(m1-n)]) ^ sign) - sign
+            i += 1
+
+# FIR filter with direct convolution, for short filters.
+# For long filters, fft_int.FFTConvolver is faster.
+# taps: list or tuple of Q15 integers, for example from fir_lowpass().
+# With sum(abs(taps)) <= 32768 (gain 1), samples can use 16 bits.
+class FIR:
+    def __init__( self, taps ):
+        self.m = len(taps)
+        if self.m < 1:
+            raise ValueError
+        self.taps = array.array("i", taps)
+        # At least one element, so that it can be passed as ptr32
+        self.history = array.array("i", (0 for _ in range(max(self.m-1, 1))))
+
+    # Filter data, store the result in out, array.array("i") with
+    # at least len(data) elements. out can't be data.
+    def process( self, data, out, typecode=None ):
+        n = len(data)
+        if len(out) < n:
+            raise ValueError
+        m = self.m
+        if typecode is None:
+            typecode = fft_int.sample_typecode( data )
+        if typecode in ("h", "H"):
+            sign = fft_int._sign( typecode )
+            _fir16( data, out, n, self.taps, m, self.history, sign )
+            _fir_history16( data, n, self.history, m-1, sign )
+        elif typecode == "i":
+            _fir32( data, out, n, self.taps, m, self.history )
+            _fir_history32( data, n, self.history, m-1 )
+        else:
+            raise ValueError
+
+    # Clear the history to start a new signal
+    def reset( self ):
+        fft_int.array_zero( self.history, len(self.history) )
+
+# Biquad coefficients (b0, b1, b2, a1, a2) in Q14, with the formulas
+# of the Audio EQ Cookbook by Robert Bristow-Johnson.
+# kind: "lowpass", "highpass", "bandpass", "notch", "peak",
+# "lowshelf" or "highshelf". frequency and sample_rate in Hz.
+# gain_db is used only by "peak", "lowshelf" and "highshelf".
+def biquad_coefficients( kind, frequency, sample_rate, q=0.7071, gain_db=0 ):
+    w = 2*pi*frequency/sample_rate
+    cos_w = cos(w)
+    alpha = sin(w)/(2*q)
+    g = 10**(gain_db/40)
+    if kind == "lowpass":
+        b = ( (1-cos_w)/2, 1-cos_w, (1-cos_w)/2 )
+        a = ( 1+alpha, -2*cos_w, 1-alpha )
+    elif kind == "highpass":
+        b = ( (1+cos_w)/2, -(1+cos_w), (1+cos_w)/2 )
+        a = ( 1+alpha, -2*cos_w, 1-alpha )
+    elif kind == "bandpass":
+        # Constant 0 dB peak gain
+        b = ( alpha, 0, -alpha )
+        a = ( 1+alpha, -2*cos_w, 1-alpha )
+    elif kind == "notch":
+        b = ( 1, -2*cos_w, 1 )
+        a = ( 1+alpha, -2*cos_w, 1-alpha )
+    elif kind == "peak":
+        b = ( 1+alpha*g, -2*cos_w, 1-alpha*g )
+        a = ( 1+alpha/g, -2*cos_w, 1-alpha/g )
+    elif kind == "lowshelf":
+        s = 2*sqrt(g)*alpha
+        b = ( g*((g+1)-(g-1)*cos_w+s), 2*g*((g-1)-(g+1)*cos_w), g*((g+1)-(g-1)*cos_w-s) )
+        a = ( (g+1)+(g-1)*cos_w+s, -2*((g-1)+(g+1)*cos_w), (g+1)+(g-1)*cos_w-s )
+    elif kind == "highshelf":
+        s = 2*sqrt(g)*alpha
+        b = ( g*((g+1)+(g-1)*cos_w+s), -2*g*((g-1)+(g+1)*cos_w), g*((g+1)+(g-1)*cos_w-s) )
+        a = ( (g+1)-(g-1)*cos_w+s, 2*((g-1)-(g+1)*cos_w), (g+1)-(g-1)*cos_w-s )
+    else:
+        raise ValueError
+    factor = (1<<BIQUAD_SHIFT)/a[0]
+    return ( round(b[0]*factor), round(b[1]*factor), round(b[2]*factor),
+             round(a[1]*factor), round(a[2]*factor) )
+
+# Windowed sinc lowpass FIR filter, Q15 taps with gain 1 at DC.
+# taps: number of taps, odd for a symmetric filter.
+# window: "hann", "hamming" or "blackman", see fft_int.WINDOWS
+def fir_lowpass( taps, cutoff, sample_rate, window="hamming" ):
+    if taps < 3:
+        raise ValueError
+    fc = cutoff/sample_rate
+    coefficients = fft_int.WINDOWS[window]
+    middle = (taps-1)/2
+    h = []
+    for i in range(taps):
+        t = i - middle
+        if t == 0:
+            x = 2*fc
+        else:
+            x = sin(2*pi*fc*t)/(pi*t)
+        # Window centered on the filter
+        h.append( x*sum( c*cos(2*pi*k*i/(taps-1)) for k, c in enumerate(coefficients) ) )
+    total = sum(h)
+    h = [ round(x/total*(1<<FIR_SHIFT)) for x in h ]
+    # Correct the rounding so that the gain at DC is exactly 1
+    h[taps//2] += (1<<FIR_SHIFT) - sum(h)
+    return tuple( h )
+
+# Highpass FIR filter by spectral inversion of fir_lowpass,
+# taps must be odd.
+def fir_highpass( taps, cutoff, sample_rate, window="hamming" ):
+    if taps % 2 == 0:
+        raise ValueError
+    h = [ -x for x in fir_lowpass( taps, cutoff, sample_rate, window ) ]
+    h[taps//2] += 1<<FIR_SHIFT
+    return tuple( h )
@@ -0,0 +1,176 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Goertzel algorithm, see https://en.wikipedia.org/wiki/Goertzel_algorithm
+# Computes a few bins of the DFT, for example to detect DTMF tones or
+# the presence of a tone, with less CPU time and memory than a
+# complete FFT. The cost is about n multiplications per bin, so this
+# is faster than fft() when only a few bins are needed, see
+# goertzel_benchmark.py.
+#
+# All bins are evaluated in a single pass over the samples.
+# The result is scaled as the result of fft_int.fft(), i.e. the DFT
+# divided by n, so fft_int.fft_power and fft_int.fft_magnitude can
+# be used with it. The phase is not the phase of the DFT, only the
+# magnitude is.
+#
+# The state of the filter grows up to about n*n*max(abs(signal))/6 for the
+# lowest bin, this must be less than 2**30. For example, for n=1024 samples
+# must be between -2048 and 2047.
+
+import array
+from math import cos, sin, pi
+import fft_int
+
+# The coefficients are scaled by COEFFICIENT_FACTOR, 2**28, since
+# for the low bins of a large n, 2*cos(w) is very near to 2.
+# Products are computed splitting both factors in the upper bits
+# and the lower SPLIT_SHIFT bits, so that no intermediate result overflows.
+COEFFICIENT_FACTOR = const(0x10000000)
+SPLIT_SHIFT = const(14) # half of the 28 bits of COEFFICIENT_FACTOR
+MASK = const(0x3fff) # (1<<SPLIT_SHIFT)-1
+
+# The coefficients for a bin, (cos(w), sin(w)) scaled by
+# COEFFICIENT_FACTOR, are computed once for each (frequency, sample_rate, n)
+_coefficients = {}
+
+# The frequency is rounded to the nearest bin k of a n point DFT,
+# so that the result is equal to fft()[k]
+def bin_coefficients( frequency, sample_rate, n ):
+    key = (frequency, sample_rate, n)
+    c = _coefficients.get( key )
+    if c is None:
+        k = round( frequency*n/sample_rate )
+        w = 2*pi*k/n
+        # cos(w) is used for 2*cos(w)*s1 in the filter loop
+        # and for cos(w)*s2 in the result
+        c = ( round(COEFFICIENT_FACTOR*cos(w)),
+              round(COEFFICIENT_FACTOR*sin(w)) )
+        _coefficients[key] = c
+    return c
+
+def clear_coefficient_cache():
+    _coefficients.clear()
+
+# Store the result for each bin in real[i], imag[i], from the
+# last two states s1 and s2 in state[2*i], state[2*i+1].
+@micropython.viper
+def _goertzel_result( coefficients:ptr32, k:int, state:ptr32, n:int, real:ptr32, imag:ptr32 ):
+    i:int = 0
+    while i < k:
+        s1:int = state[2*i]
+        s2:int = state[2*i+1]
+        sh:int = s2>>SPLIT_SHIFT
+        sl:int = s2 & MASK
+        c:int = coefficients[2*i]
+        ch:int = c>>SPLIT_SHIFT
+        cl:int = c & MASK
+        real[i] = (s1 - (ch*sh + ((ch*sl)>>SPLIT_SHIFT) + ((cl*sh)>>SPLIT_SHIFT)))//n
+        c = coefficients[2*i+1]
+        ch = c>>SPLIT_SHIFT
+        cl = c & MASK
+        imag[i] = (ch*sh + ((ch*sl)>>SPLIT_SHIFT) + ((cl*sh)>>SPLIT_SHIFT))//n
+        state[2*i] = 0
+        state[2*i+1] = 0
+        i += 1
+
+# Goertzel filter for k bins over data[0:n].
+# coefficients: array.array("i") with 2 values per bin, see bin_coefficients
+# state: array.array("i") of 2*k elements, must be zero.
+# The new state is x + 2*cos(w)*s1 - s2, with 2*cos(w)*s1 computed
+# as 2*(c*s1>>28) splitting c and s1.
+@micropython.viper
+def _goertzel32( data:ptr32, n:int, coefficients:ptr32, k:int, state:ptr32 ):
+    j:int = 0
+    while j < n:
+        x:int = data[j]
+        p:ptr32 = ptr32(state)
+        pc:ptr32 = ptr32(coefficients)
+        i:int = 0
+        while i < k:
+            s1:int = p[0]
+            c:int = pc[0]
+            ch:int = c>>SPLIT_SHIFT
+            sh:int = s1>>SPLIT_SHIFT
+            product:int = ch*sh + ((ch*(s1 & MASK) + (c & MASK)*sh)>>SPLIT_SHIFT)
+            p[0] = x + product + product - p[1]
+            p[1] = s1
+            p = ptr32(uint(p)+8)
+            pc = ptr32(uint(pc)+8)
+            i += 1
+        j += 1
+
+# Same as _goertzel32 for 16 bit samples, sign is fft_int.SIGN16
+# for signed samples and 0 for unsigned samples.
+@micropython.viper
+def _goertzel16( data:ptr16, n:int, coefficients:ptr32, k:int, state:ptr32, sign:int ):
+    j:int = 0
+    while j < n:
+        x:int = (int(data[j]) ^ sign) - sign
+        p:ptr32 = ptr32(state)
+        pc:ptr32 = ptr32(coefficients)
+        i:int = 0
+        while i < k:
+            s1:int = p[0]
+            c:int = pc[0]
+            ch:int = c>>SPLIT_SHIFT
+            sh:int = s1>>SPLIT_SHIFT
+            product:int = ch*sh + ((ch*(s1 & MASK) + (c & MASK)*sh)>>SPLIT_SHIFT)
+            p[0] = x + product + product - p[1]
+            p[1] = s1
+            p = ptr32(uint(p)+8)
+            pc = ptr32(uint(pc)+8)
+            i += 1
+        j += 1
+
+# Goertzel filter for a fixed set of frequencies, sample rate
+# and block size n. The buffers are allocated once.
+class Goertzel:
+    def __init__( self, frequencies, sample_rate, n ):
+        self.frequencies = tuple(frequencies)
+        self.sample_rate = sample_rate
+        self.n = n
+        k = len(self.frequencies)
+        self.k = k
+        self.coefficients = array.array("i", (0 for _ in range(2*k)))
+        for i, frequency in enumerate(self.frequencies):
+            self.coefficients[2*i:2*i+2] = array.array("i", bin_coefficients( frequency, sample_rate, n ))
+        self.state = array.array("i", (0 for _ in range(2*k)))
+        self.real = array.array("i", (0 for _ in range(k)))
+        self.imag = array.array("i", (0 for _ in range(k)))
+        self._result = (self.real, self.imag)
+
+    # Returns (real, imag), real[i] and imag[i] is the bin
+    # for frequencies[i]. data can be array.array "i", "h" or "H".
+    # See fft_int.array_copy_typed for typecode.
+    def process( self, data, typecode=None ):
+        n = self.n
+        if len(data) < n:
+            raise ValueError
+        if typecode is None:
+            typecode = fft_int.sample_typecode( data )
+        if typecode in ("h", "H"):
+            _goertzel16( data, n, self.coefficients, self.k, self.state, fft_int._sign( typecode ) )
+        elif typecode == "i":
+            _goertzel32( data, n, self.coefficients, self.k, self.state )
+        else:
+            raise ValueError
+        _goertzel_result( self.coefficients, self.k, self.state, n, self.real, self.imag )
+        return self._result
+
+    # Power of each bin, see fft_int.fft_power
+    def power( self, out ):
+        fft_int.fft_power( self.real, self.imag, 0, self.k, out )
+
+_goertzel = None
+
+# Bins of data for frequencies, returns (real, imag), see Goertzel.
+# The Goertzel object is kept for the next call with the same parameters.
+def goertzel( data, frequencies, sample_rate, typecode=None ):
+    global _goertzel
+    g = _goertzel
+    if ( g is None or g.n != len(data) or g.sample_rate != sample_rate
+         or g.frequencies != tuple(frequencies) ):
+        g = Goertzel( frequencies, sample_rate, len(data) )
+        _goertzel = g
+    return g.process( data, typecode )
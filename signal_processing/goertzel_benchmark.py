@@ -0,0 +1,36 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Compare the Goertzel algorithm for K bins with fft()+fft_abs()
+# to find out up to how many bins goertzel is faster.
+# Run on the unix port or on the board with: micropython goertzel_benchmark.py
+import sys
+import array
+import random
+import fft_int
+import goertzel
+sys.path.append("..")
+import benchmark
+
+REPEAT = 5
+SAMPLE_RATE = 8000
+
+def fft_and_abs( data, n ):
+    return fft_int.fft_abs( fft_int.fft( data ), 0, n//2 )
+
+for n in (256, 1024):
+    data = [ random.randint(-2047, 2047) for _ in range(n) ]
+    samples = array.array("i", data)
+    # Create the plan before measuring
+    fft_int.fft( data )
+    fft_time = benchmark.run(f"fft+fft_abs n={n}", fft_and_abs, data, n, repeat=REPEAT )
+
+    faster = 0
+    for k in (1, 2, 4, 8, 16, 32):
+        bins = [ 1+i*(n//2-1)//k for i in range(k) ]
+        frequencies = [ b*SAMPLE_RATE/n for b in bins ]
+        g = goertzel.Goertzel( frequencies, SAMPLE_RATE, n )
+        goertzel_time = benchmark.run(f"goertzel n={n} K={k}", g.process, samples, repeat=REPEAT )
+        if goertzel_time["min_us"] < fft_time["min_us"]:
+            faster = k
+    print(f"n={n}: goertzel is faster than fft+fft_abs up to K={faster} bins")
@@ -0,0 +1,134 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Pitch (fundamental frequency) detection with the autocorrelation,
+# for example for a tuner.
+#
+# detect_pitch( signal, sample_rate ) returns (frequency, confidence).
+# frequency is in Hz, confidence from 0 to 1 is the normalized
+# autocorrelation at the period found, near 1 for a clean periodic
+# signal, near 0 for noise. If no pitch is found, (0, 0) is returned.
+#
+# signal: array.array("i") with the samples, without DC offset (for
+# a unsigned ADC, subtract the mid scale value first). There are no
+# overflow checks, size*max(abs(signal))**2 must be less than 2**31,
+# so for 1024 sample frames the samples should be between -1024 and 1024.
+#
+# Only the lags for the frequency range min_freq to max_freq are
+# computed, and peak picking and parabolic interpolation of the peak
+# are done in viper, so there are no Python loops per lag.
+
+import array
+import autocorrelation
+
+# Precision of the interpolated lag, 8 bits of fraction
+LAG_SHIFT = const(8)
+
+# A peak is accepted if it is above this fraction of the largest peak,
+# as PEAK_THRESHOLD/256. The first peak above this value is chosen,
+# this prevents reporting an octave below the true pitch.
+PEAK_THRESHOLD = const(224)
+
+# Find the first local maximum of auto_signal[1:n-1] that is above
+# threshold/256 of the largest local maximum, and return the index of the
+# maximum interpolated with a parabola, with LAG_SHIFT bits of fraction.
+# Returns 0 if there is no positive local maximum.
+@micropython.viper
+def _pick_peak( auto_signal:ptr32, n:int, threshold:int )->int:
+    largest:int = 0
+    i:int = 1
+    while i < n-1:
+        b:int = auto_signal[i]
+        if b > largest and b > auto_signal[i-1] and b >= auto_signal[i+1]:
+            largest = b
+        i += 1
+    if largest <= 0:
+        return 0
+    limit:int = largest - (((largest>>8)*(256-threshold)))
+    peak:int = 0
+    i = 1
+    while i < n-1:
+        b = auto_signal[i]
+        if b >= limit and b > auto_signal[i-1] and b >= auto_signal[i+1]:
+            peak = i
+            break
+        i += 1
+    if peak == 0:
+        return 0
+    # Parabola through the peak and its neighbours, scaled down
+    # so that the shift below can't overflow
+    a:int = auto_signal[peak-1]
+    b = auto_signal[peak]
+    c:int = auto_signal[peak+1]
+    while b >= 0x400000 or a >= 0x400000 or c >= 0x400000 or a <= -0x400000 or c <= -0x400000:
+        a = a>>1
+        b = b>>1
+        c = c>>1
+    denominator:int = a - 2*b + c
+    fraction:int = 0
+    if denominator < 0:
+        fraction = ((c - a)<<(LAG_SHIFT-1))//(0-denominator)
+    return (peak<<LAG_SHIFT) + fraction
+
+# Pitch detector for a fixed frame size, sample rate and frequency
+# range. Allocates the autocorrelation buffer once.
+class PitchDetector:
+    def __init__( self, sample_rate, size, min_freq=50, max_freq=2000 ):
+        # Lag range, with one more lag on each side for
+        # the interpolation
+        min_lag = sample_rate // max_freq
+        max_lag = sample_rate // min_freq
+        if min_lag < 2:
+            min_lag = 2
+        if max_lag > size-2:
+            max_lag = size-2
+        if max_lag <= min_lag:
+            raise ValueError
+        self.sample_rate = sample_rate
+        self.size = size
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.first_lag = min_lag - 1
+        self.last_lag = max_lag + 1
+        self.auto_signal = array.array("i", (0 for _ in range(self.last_lag-self.first_lag+1)))
+        self.energy = array.array("i", (0,))
+
+    # Returns (frequency, confidence) for signal[0:size]
+    def detect( self, signal ):
+        size = self.size
+        if len(signal) < size:
+            raise ValueError
+        autocorrelation.autocorrelation_lags( signal, size, self.energy, 0, 0 )
+        energy = self.energy[0]
+        if energy <= 0:
+            return 0, 0
+        auto_signal = self.auto_signal
+        autocorrelation.autocorrelation_lags( signal, size, auto_signal, self.first_lag, self.last_lag )
+        peak = _pick_peak( auto_signal, len(auto_signal), PEAK_THRESHOLD )
+        if peak == 0:
+            return 0, 0
+        index = (peak + (1<<(LAG_SHIFT-1))) >> LAG_SHIFT
+        lag = self.first_lag + index
+        frequency = self.sample_rate * (1<<LAG_SHIFT) / ((self.first_lag<<LAG_SHIFT) + peak)
+        # Normalize for the number of products summed at this lag
+        confidence = auto_signal[index] * size / ((size-lag) * energy)
+        if confidence > 1:
+            confidence = 1
+        elif confidence < 0:
+            confidence = 0
+        return frequency, confidence
+
+_detector = None
+
+# Pitch of signal, see PitchDetector. The PitchDetector is kept for
+# the next call with the same parameters.
+def detect_pitch( signal, sample_rate, min_freq=50, max_freq=2000, size=None ):
+    global _detector
+    if size is None:
+        size = len(signal)
+    d = _detector
+    if ( d is None or d.sample_rate != sample_rate or d.size != size
+         or d.min_freq != min_freq or d.max_freq != max_freq ):
+        d = PitchDetector( sample_rate, size, min_freq, max_freq )
+        _detector = d
+    return d.detect( signal )
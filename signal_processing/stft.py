@@ -0,0 +1,145 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Short time Fourier transform (spectrogram) with the integer FFT.
+# Samples are pulled from the source into a ring buffer of n samples,
+# every hop samples the last n samples are windowed and transformed.
+# Memory use is bounded: the ring buffer and one set of rfft buffers.
+#
+#    for real, imag in stft( samples, 256, 64 ):
+#        # real and imag hold the bins 0 to 128, see fft_int.rfft
+#
+# or from a asyncio task, with the DC offset of unsigned 16 bit
+# samples removed, so that the windowed samples fit in 16 bits:
+#    async for real, imag in stft( adc.read_u16, 256, 64, offset=32768 ):
+#        ...
+import array
+import asyncio
+import fft_int
+
+# Copy count elements of data starting at start to the ring buffer
+# at position, minus offset. data can be any list or array.
+# Returns the new position.
+@micropython.viper
+def _ring_write( data, start:int, count:int, ring:ptr32, position:int, size:int, offset:int )->int:
+    i:int = 0
+    while i < count:
+        ring[position] = int(data[start+i]) - offset
+        position = position + 1
+        if position >= size:
+            position = 0
+        i = i + 1
+    return position
+
+# Copy the ring buffer to out, oldest sample first.
+@micropython.viper
+def _ring_read( ring:ptr32, position:int, size:int, out:ptr32 ):
+    i:int = 0
+    while i < size:
+        out[i] = ring[position]
+        position = position + 1
+        if position >= size:
+            position = 0
+        i = i + 1
+
+# source: where the samples come from, one of
+#   a list, tuple or array: the frames are taken from it, the iteration
+#       ends when less than hop samples are left.
+#   a function without arguments that returns one sample, for example
+#       machine.ADC(pin).read_u16. The iteration never ends.
+#   any other iterable or iterator of integers, the iteration ends with it.
+# n: FFT size, a power of two.
+# hop: number of new samples for each frame, can be less than n
+#   for overlapping frames.
+# hann_windowing: apply a Hann window to each frame.
+# window: or apply this window, see fft_int.get_window
+# offset: subtracted from each sample. With a window, the samples
+#   must fit in 16 bits, use offset=32768 for unsigned 16 bit samples
+#   such as those of ADC.read_u16().
+# Each frame yields (real, imag), the result of fft_int.rfft. These
+# buffers are reused for the next frame.
+class STFT:
+    def __init__( self, source, n, hop, hann_windowing=True, window=None, offset=0 ):
+        if hop < 1:
+            raise ValueError
+        self.n = n
+        self.hop = hop
+        self.offset = offset
+        self._data = None
+        self._function = None
+        self._iterator = None
+        if isinstance( source, (list, tuple, array.array, bytes, bytearray, memoryview) ):
+            self._data = source
+        elif callable( source ):
+            self._function = source
+        else:
+            self._iterator = iter( source )
+        self._index = 0
+        self._ring = array.array("i", (0 for _ in range(n)))
+        self._position = 0
+        self._frame = array.array("i", self._ring)
+        plan = fft_int.get_plan( n )
+        # Window table, computed once
+        self._window = plan._window( hann_windowing, window )
+        self._buffers = plan.buffers()
+        # The first frame needs n samples, then hop samples per frame
+        self._needed = n
+
+    # Put count new samples in the ring buffer.
+    # Returns False if the source has no more samples.
+    def _fill( self, count ):
+        ring = self._ring
+        n = self.n
+        if self._data is not None:
+            if self._index + count > len(self._data):
+                return False
+            self._position = _ring_write( self._data, self._index, count, ring, self._position, n, self.offset )
+            self._index += count
+            return True
+        position = self._position
+        function = self._function
+        offset = self.offset
+        try:
+            for _ in range(count):
+                if function is not None:
+                    ring[position] = function() - offset
+                else:
+                    ring[position] = next( self._iterator ) - offset
+                position += 1
+                if position >= n:
+                    position = 0
+        except StopIteration:
+            return False
+        finally:
+            self._position = position
+        return True
+
+    def _next_frame( self ):
+        if not self._fill( self._needed ):
+            return None
+        self._needed = self.hop
+        _ring_read( self._ring, self._position, self.n, self._frame )
+        return self._buffers.rfft( self._frame, False, self._window )
+
+    def __iter__( self ):
+        return self
+
+    def __next__( self ):
+        result = self._next_frame()
+        if result is None:
+            raise StopIteration
+        return result
+
+    def __aiter__( self ):
+        return self
+
+    # Same as __next__, but lets other tasks run after each frame
+    async def __anext__( self ):
+        result = self._next_frame()
+        if result is None:
+            raise StopAsyncIteration
+        await asyncio.sleep_ms( 0 )
+        return result
+
+def stft( source, n, hop, hann_windowing=True, window=None, offset=0 ):
+    return STFT( source, n, hop, hann_windowing, window, offset )
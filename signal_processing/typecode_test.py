@@ -0,0 +1,58 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Test that fft() and rfft() give the same result for the same samples
+# in a list and in arrays of each typecode, in particular float arrays
+# and unsigned 16 bit arrays such as the samples of ADC.read_u16().
+# Run on the unix port or on the board with: micropython typecode_test.py
+import array
+import random
+import fft_int
+
+N = 64
+
+def same_fft( samples, data, typecode=None ):
+    expected_real, expected_imag = fft_int.fft( samples )
+    expected_real = list( expected_real )
+    expected_imag = list( expected_imag )
+    real, imag = fft_int.fft( data, typecode=typecode )
+    assert list( real ) == expected_real and list( imag ) == expected_imag
+    expected_real, expected_imag = fft_int.rfft( samples )
+    expected_real = list( expected_real )
+    expected_imag = list( expected_imag )
+    real, imag = fft_int.rfft( data, typecode=typecode )
+    assert list( real ) == expected_real and list( imag ) == expected_imag
+
+unsigned16 = [ random.randint(0, 65535) for _ in range(N) ]
+signed16 = [ random.randint(-32768, 32767) for _ in range(N) ]
+unsigned8 = [ random.randint(0, 255) for _ in range(N) ]
+signed8 = [ random.randint(-128, 127) for _ in range(N) ]
+
+assert fft_int.sample_typecode( array.array("H", unsigned16) ) == "H"
+assert fft_int.sample_typecode( array.array("h", signed16) ) == "h"
+assert fft_int.sample_typecode( array.array("i", signed16) ) == "i"
+assert fft_int.sample_typecode( array.array("f", signed16) ) is None
+assert fft_int.sample_typecode( array.array("b", signed8) ) == "b"
+assert fft_int.sample_typecode( bytearray( unsigned8 ) ) == "B"
+assert fft_int.sample_typecode( signed16 ) is None
+# 16 bit memoryviews could be signed or unsigned
+assert fft_int.sample_typecode( memoryview( array.array("H", unsigned16) ) ) is None
+
+# Float samples are converted to integers, not copied as bit patterns
+same_fft( signed16, array.array("f", signed16) )
+# Unsigned samples above 32767 keep their value
+same_fft( unsigned16, array.array("H", unsigned16) )
+same_fft( unsigned16, memoryview( array.array("H", unsigned16) ) )
+same_fft( unsigned16, array.array("i", unsigned16) )
+same_fft( signed16, array.array("h", signed16) )
+same_fft( signed8, array.array("b", signed8) )
+same_fft( unsigned8, bytearray( unsigned8 ) )
+same_fft( unsigned8, bytes( unsigned8 ) )
+# An explicit typecode for a memoryview
+same_fft( unsigned16, memoryview( array.array("H", unsigned16) ), "H" )
+
+# The typecode cache keeps at most TYPECODE_CACHE_SIZE arrays alive
+assert len( fft_int._typecodes ) <= fft_int.TYPECODE_CACHE_SIZE
+fft_int.clear_typecodes()
+assert len( fft_int._typecodes ) == 0
+print("typecode test complete")
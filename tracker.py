@@ -0,0 +1,175 @@
+# (c) 2023 Hermann Paul von Borries
+# MIT License
+
+# Common part of profiler.py and memtrack.py. A Tracker has a
+# preallocated array of statistics with one slot of fields per name,
+# and wraps functions and regions of code so that each call reads
+# three counters before and records what changed after.
+#
+# read0, read1 and read2 are functions without arguments, they are
+# called in this order before the call. After the call,
+# stop( slot, v0, v1, v2 ) gets the values read and must record them
+# in stats without allocating. The values are kept in local variables
+# of the wrapper, so nested and recursive calls are recorded correctly.
+# The time between the return of the call and the first reading in
+# stop includes the call of stop.
+import array
+
+# Cumulative values are split in a low part of 30 bits and a high
+# part, so they don't overflow and stay small ints.
+LOW_MASK = const(0x3fffffff)
+LOW_SHIFT = const(30)
+
+class Tracker:
+    def __init__( self, label, max_slots, fields, read0, read1, read2, stop ):
+        self.label = label
+        self.max_slots = max_slots
+        self.fields = fields
+        self.stats = array.array("i", (0 for _ in range(max_slots*fields)))
+        self.names = []
+        self.read0 = read0
+        self.read1 = read1
+        self.read2 = read2
+        self.stop = stop
+
+    # Slot for name, a new one if the name is not known
+    def slot( self, name ):
+        names = self.names
+        if name in names:
+            return names.index( name )
+        if len(names) >= self.max_slots:
+            raise ValueError(f"{self.label}: more than MAX_SLOTS names")
+        names.append( name )
+        return len(names)-1
+
+    # The wrappers for 0 to 5 arguments are written out, as in
+    # benchmark.py, so that the call allocates nothing. Other numbers
+    # of arguments use *args, each call allocates a tuple, before the
+    # first reading.
+    def wrap( self, function, s, nargs ):
+        read0 = self.read0
+        read1 = self.read1
+        read2 = self.read2
+        stop = self.stop
+        if nargs == 0:
+            def wrapper():
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function()
+                stop( s, v0, v1, v2 )
+                return result
+        elif nargs == 1:
+            def wrapper(a):
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function(a)
+                stop( s, v0, v1, v2 )
+                return result
+        elif nargs == 2:
+            def wrapper(a, b):
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function(a, b)
+                stop( s, v0, v1, v2 )
+                return result
+        elif nargs == 3:
+            def wrapper(a, b, c):
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function(a, b, c)
+                stop( s, v0, v1, v2 )
+                return result
+        elif nargs == 4:
+            def wrapper(a, b, c, d):
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function(a, b, c, d)
+                stop( s, v0, v1, v2 )
+                return result
+        elif nargs == 5:
+            def wrapper(a, b, c, d, e):
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function(a, b, c, d, e)
+                stop( s, v0, v1, v2 )
+                return result
+        else:
+            def wrapper(*args):
+                v0 = read0()
+                v1 = read1()
+                v2 = read2()
+                result = function(*args)
+                stop( s, v0, v1, v2 )
+                return result
+        return wrapper
+
+    # Decorator that wraps a function with the slot for name.
+    # If enabled is False, the function is returned unchanged.
+    def decorator( self, name, nargs, enabled ):
+        def decorator( function ):
+            if not enabled:
+                return function
+            return self.wrap( function, self.slot( name ), nargs )
+        return decorator
+
+    # Replace module.name by a wrapper, shown as module_name.name.
+    # Returns the original function, to undo with
+    # setattr( module, name, original ).
+    def instrument( self, module, name, nargs, enabled ):
+        function = getattr( module, name )
+        if enabled:
+            setattr( module, name, self.wrap( function, self.slot( f"{module.__name__}.{name}" ), nargs ) )
+        return function
+
+    # Context manager for the code in a with block, create it once,
+    # outside the loop. If enabled is False, the region reads nothing.
+    def region( self, name, enabled ):
+        if not enabled:
+            return _disabled_region
+        return Region( self, name )
+
+    # Cumulative value of the slot starting at stats[i],
+    # see LOW_SHIFT
+    def total( self, i, low, high ):
+        stats = self.stats
+        return (stats[i+high] << LOW_SHIFT) + stats[i+low]
+
+    def reset( self ):
+        stats = self.stats
+        for i in range(len(stats)):
+            stats[i] = 0
+
+class Region:
+    def __init__( self, tracker, name ):
+        self.slot = tracker.slot( name )
+        self.read0 = tracker.read0
+        self.read1 = tracker.read1
+        self.read2 = tracker.read2
+        self.stop = tracker.stop
+        self.v0 = 0
+        self.v1 = 0
+        self.v2 = 0
+
+    def __enter__( self ):
+        self.v0 = self.read0()
+        self.v1 = self.read1()
+        self.v2 = self.read2()
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.stop( self.slot, self.v0, self.v1, self.v2 )
+
+class _DisabledRegion:
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        pass
+
+_disabled_region = _DisabledRegion()
@@ -4,16 +4,7 @@
 # Viper example to measure time
 import machine
 machine.freq(240_000_000)
-import time
-class MeasureTime:
-    def __init__(self, title ):
-        self.title = title
-    def __enter__( self ):
-        self.t0 = time.ticks_ms()
-        return self
-    def __exit__( self, exc_type, exc_val, exc_traceback ):
-        self.time_msec = time.ticks_diff( time.ticks_ms(), self.t0 )
-        print(f"MeasureTime {self.title} {self.time_msec} msec" )
+import benchmark
 
 @micropython.viper
 def v_no_hints(limit:int)->int:
@@ -51,20 +42,19 @@ def undecorated_fun(limit):
 
 print("Comparison of viper with hints, no hints, range and native")
 limit = 5_000_000
-with MeasureTime("viper, no hints"):
-    assert v_no_hints(limit) == limit
+assert v_no_hints(limit) == limit
+benchmark.run("viper, no hints", v_no_hints, limit)
 
-with MeasureTime("viper, with hints"):
-    assert v_hints(limit) == limit
+assert v_hints(limit) == limit
+benchmark.run("viper, with hints", v_hints, limit)
     
-with MeasureTime("using range"):
-    assert v_range(limit) == limit
+assert v_range(limit) == limit
+benchmark.run("using range", v_range, limit)
 
-with MeasureTime("native"):
-    assert native_fun(limit) == limit
+assert native_fun(limit) == limit
+benchmark.run("native", native_fun, limit)
 
-#with MeasureTime("undecorated"):
-#    assert undecorated_fun(limit) == limit
+#benchmark.run("undecorated", undecorated_fun, limit)
 
 # Result on ESP32-S3 with PSRAM at 240 Mhz
 #MeasureTime viper, no hints 271 msec
@@ -91,36 +81,14 @@ def viper_fun_hints(a:int,b:int,c:int,d:int,e:int):
 def viper_fun_no_args():
     return
 
+# See call_overhead.py for more argument and return types,
+# methods, generators and asyncio
 def call_funs(limit):
-    with MeasureTime( "range only") as range_only:
-        for i in range(limit):
-            pass
-
-    with MeasureTime("undecorated function") as undecorated:
-        for i in range(limit):
-            undecorated_fun(1,2,3,4,5)
-
-    with MeasureTime("viper function") as viper:
-        for i in range(limit):
-            viper_fun(1,2,3,4,5)
-
-    with MeasureTime("viper with hints function") as viper_hints:
-        for i in range(limit):
-            viper_fun_hints(1,2,3,4,5)
-
-    with MeasureTime("viper with hints function") as no_args:
-        for i in range(limit):
-            viper_fun_no_args()
-
-
-    undecorated_time = undecorated.time_msec - range_only.time_msec
-    viper_time = viper.time_msec - range_only.time_msec
-    viper_hints_time = viper_hints.time_msec - range_only.time_msec
-    viper_fun_no_args_time = no_args.time_msec - range_only.time_msec
+    # benchmark.run subtracts the time of the empty loop
     print(f"{limit} function calls")
-    print(f"{undecorated_time=}, {undecorated_time/limit*1000:.2f} usec per call")
-    print(f"{viper_time=} {viper_time/limit*1000:2f} usec per call")
-    print(f"{viper_hints_time=} {viper_hints_time/limit*1000:2f} usec per call")
-    print(f"{viper_fun_no_args_time=} {viper_fun_no_args_time/limit*1000:2f} usec per call")
+    benchmark.run("undecorated function", undecorated_fun, 1, 2, 3, 4, 5, loops=limit)
+    benchmark.run("viper function", viper_fun, 1, 2, 3, 4, 5, loops=limit)
+    benchmark.run("viper with hints function", viper_fun_hints, 1, 2, 3, 4, 5, loops=limit)
+    benchmark.run("viper function no args", viper_fun_no_args, loops=limit)
 
 call_funs(1_000_000)
\ No newline at end of file